@@ -1,5 +1,6 @@
 from typing import List, Optional, Dict, Any
 import configparser
+import functools
 import os
 import logging
 from persistence import PersistenceError # Ensure PersistenceError is imported or defined
@@ -44,7 +45,10 @@ class ConfigManager:
     def _create_default_config(self):
         self.config['API'] = {
             'gemini_api_key': 'YOUR_API_KEY_HERE',
-            'gemini_model': 'gemini-1.5-flash-latest' # Add default model here
+            'gemini_model': 'gemini-1.5-flash-latest', # Add default model here
+            'summary_model': '', # Cheaper model for summarization (e.g. gemini-1.5-flash-8b); empty reuses gemini_model
+            'requests_per_minute': '0', # Client-side quota throttle, off by default; e.g. 15 for the free-tier Flash quota
+            'tokens_per_minute': '0' # e.g. 1000000 for the free-tier Flash quota; 0 disables
         }
         self.config['PATHS'] = {
             'default_dev_logs_dir': './dev_logs',
@@ -53,7 +57,14 @@ class ConfigManager:
         self.config['GEMINI_CONTEXT'] = {
             'max_history_turns': '20',
             'max_context_tokens': '30000', # Check model limits
-            'max_summary_tokens': '1000'
+            'max_summary_tokens': '1000',
+            'max_output_tokens': '8192', # Upper bound on a next-step reply; lower it to cap worst-case latency
+            'history_token_budget': '4000', # Recent history is trimmed (oldest first) to roughly this many tokens
+            'response_cache_ttl_seconds': '0', # Opt-in: seconds to reuse replies to identical prompts; 0 disables
+            'response_cache_max_entries': '256',
+            'explicit_prompt_cache': 'false', # Requires a versioned, cache-capable model and a prefix above its minimum size
+            'explicit_prompt_cache_ttl_minutes': '60',
+            'summary_cache_path': 'app_data/summary_cache.db' # Persistent summarization cache; empty disables
         }
         self.config['ENGINE_CONFIG'] = {
             'cursor_log_timeout_seconds': '300', # 5 minutes
@@ -99,6 +110,10 @@ class ConfigManager:
     def get_gemini_model(self) -> str:
         return self.config.get('API', 'gemini_model', fallback='gemini-1.5-flash') # Default to flash
 
+    def get_gemini_summary_model(self) -> str:
+        """Model used for context summarization; empty means the same model as gemini_model."""
+        return self.config.get('API', 'summary_model', fallback='') or self.get_gemini_model()
+
     def get_max_output_tokens_gemini(self) -> int:
          return self.config.getint('GEMINI_CONTEXT', 'max_output_tokens', fallback=8192)
          
@@ -113,6 +128,21 @@ class ConfigManager:
             logger.warning(f"Invalid value '{value}' for max_history_turns in config. Using default 20.")
             return 20
 
+    def get_history_token_budget(self) -> int:
+        """Approximate token budget for the recent-history window in Gemini prompts (0 disables the budget)."""
+        return self.config.getint('GEMINI_CONTEXT', 'history_token_budget', fallback=4000)
+
+    def get_explicit_prompt_cache_enabled(self) -> bool:
+        """Whether to put the SOP and project goal in an explicit Gemini CachedContent (billed storage; needs a cacheable model)."""
+        return self.config.getboolean('GEMINI_CONTEXT', 'explicit_prompt_cache', fallback=False)
+
+    def get_explicit_prompt_cache_ttl_minutes(self) -> int:
+        return self.config.getint('GEMINI_CONTEXT', 'explicit_prompt_cache_ttl_minutes', fallback=60)
+
+    def get_summary_cache_path(self) -> str:
+        """SQLite file that persists summaries across restarts. Empty disables the summary cache."""
+        return self.config.get('GEMINI_CONTEXT', 'summary_cache_path', fallback='app_data/summary_cache.db')
+
     def get_max_context_tokens(self) -> int:
         return self.config.getint('API', 'max_context_tokens', fallback=30000) # Default from example
 
@@ -124,6 +154,20 @@ class ConfigManager:
              logger.warning(f"Invalid value '{value}' for max_summary_tokens in config. Using default 1000.")
              return 1000
 
+    def get_gemini_response_cache_ttl_seconds(self) -> float:
+        """Seconds a cached Gemini next-step response stays valid. Defaults to 0 (cache off); opt in with a positive value."""
+        return self.config.getfloat('GEMINI_CONTEXT', 'response_cache_ttl_seconds', fallback=0.0)
+
+    def get_gemini_response_cache_max_entries(self) -> int:
+        return self.config.getint('GEMINI_CONTEXT', 'response_cache_max_entries', fallback=256)
+
+    def get_gemini_requests_per_minute(self) -> int:
+        """Client-side RPM throttle for Gemini calls. 0 (the default when unset) disables it."""
+        return self.config.getint('API', 'requests_per_minute', fallback=0)
+
+    def get_gemini_tokens_per_minute(self) -> int:
+        return self.config.getint('API', 'tokens_per_minute', fallback=0)
+
     def get_cursor_log_timeout_seconds(self) -> int:
         return self.config.getint('ENGINE_CONFIG', 'cursor_log_timeout_seconds', fallback=300)
         
@@ -208,6 +252,11 @@ class ConfigManager:
             logger.error(f"Could not save config file {self.config_file}: {e}", exc_info=True)
             # Consider raising an error if saving is critical
 
+@functools.lru_cache(maxsize=None)
+def get_config_manager(config_file: str = 'config.ini') -> ConfigManager:
+    """Returns the shared ConfigManager for `config_file`, parsing the file only on first use."""
+    return ConfigManager(config_file)
+
 # Example usage
 if __name__ == '__main__':
     try:
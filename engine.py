@@ -5,9 +5,9 @@ from datetime import datetime
 from enum import Enum, auto
 from typing import Optional, Callable, List, Dict, Any
 import threading
-import queue
 import uuid
 import traceback
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 import json
 import logging
 from pathlib import Path
@@ -24,13 +24,13 @@ print("MAIN_DEBUG: After importing models", file=sys.stderr, flush=True)
 
 print("MAIN_DEBUG: Before importing persistence", file=sys.stderr, flush=True)
 # Revert import to bring functions/classes directly into scope, and include necessary parts
-from persistence import load_project_state, save_project_state, get_project_by_id, load_projects, save_projects, add_project, PersistenceError, DuplicateProjectError
+from persistence import load_project_state, save_project_state, append_turn, save_conversation_history, get_project_by_id, load_projects, save_projects, add_project, PersistenceError, DuplicateProjectError
 # Removed: import persistence as persistence_module
 print("MAIN_DEBUG: After importing persistence", file=sys.stderr, flush=True)
 
 # Removed: import gemini_comms
 print("MAIN_DEBUG: Before importing config_manager", file=sys.stderr, flush=True)
-from config_manager import ConfigManager
+from config_manager import ConfigManager, get_config_manager
 print("MAIN_DEBUG: After importing config_manager", file=sys.stderr, flush=True)
 
 # Try to import the mock factory, but don't fail if it's not there (e.g. deployment)
@@ -105,11 +105,10 @@ class OrchestrationEngine:
         _shutdown_complete (bool): Flag indicating if shutdown procedures have finished.
         _engine_lock (threading.RLock): A reentrant lock for synchronizing access to engine resources.
         _gemini_call_thread (Optional[threading.Thread]): Thread for making non-blocking calls to Gemini.
-        _gemini_response_queue (queue.Queue): Queue for receiving responses from the Gemini thread.
+        _gemini_response_future (Optional[Future]): Resolved by the most recently started Gemini call thread.
         pending_log_for_resumed_step (Optional[str]): Stores log content if a step is resumed after interruption.
     """
-    CURSOR_SOP_PROMPT_TEXT = """... (Full SOP content as defined previously) ...""" # Keep SOP text here
-    GEMINI_CALL_TIMEOUT_SECONDS = 60  # Added class constant for Gemini API call timeout
+    GEMINI_CALL_TIMEOUT_SECONDS = 60  # Must exceed GeminiCommunicator.CALL_TIMEOUT_SECONDS (55s) so the client times out first
 
     def __init__(self):
         print("MAIN_DEBUG: OrchestrationEngine.__init__ Start", file=sys.stderr, flush=True) # DEBUG
@@ -124,7 +123,7 @@ class OrchestrationEngine:
         self._active_mock_type: Optional[str] = None # Track if a mock is active
         try:
             print("MAIN_DEBUG: Engine.__init__: Before ConfigManager()", file=sys.stderr, flush=True) # DEBUG
-            self.config_manager = ConfigManager()
+            self.config_manager = get_config_manager()
             print("MAIN_DEBUG: Engine.__init__: After ConfigManager()", file=sys.stderr, flush=True) # DEBUG
             
             print("MAIN_DEBUG: Engine.__init__: Before _load_real_gemini_client()", file=sys.stderr, flush=True) # DEBUG
@@ -156,8 +155,16 @@ class OrchestrationEngine:
         self._shutdown_complete = False
         self._engine_lock = threading.RLock()
         self._gemini_call_thread: Optional[threading.Thread] = None
-        self._gemini_response_queue = queue.Queue()
+        self._gemini_response_future: Optional[Future] = None
         self.pending_log_for_resumed_step: Optional[str] = None
+        # Dispatch table for _process_gemini_response, keyed by next_step_action
+        self._gemini_action_handlers: Dict[str, Callable[[Dict[str, Any], str], None]] = {
+            "SUMMARY_COMPLETE": self._handle_summary_complete,
+            "WRITE_TO_FILE": self._handle_write_to_file,
+            "REQUEST_USER_INPUT": self._handle_request_user_input,
+            "TASK_COMPLETE": self._handle_task_complete,
+            "FATAL_ERROR": self._handle_fatal_error,
+        }
         if self._last_critical_error:
              logger.error(f"Engine started with critical error: {self._last_critical_error}")
 
@@ -320,6 +327,7 @@ class OrchestrationEngine:
         except FileNotFoundError:
             logger.info(f"No existing state file found for project '{project_to_load.name}'. Creating new state.")
             self.current_project_state = ProjectState(project_id=project_to_load.project_id)
+            self._reset_conversation_history_file(project_to_load)
             if self.config_manager: # Apply global config defaults to new project state
                 self.current_project_state.max_history_turns = self.config_manager.get_max_history_turns()
                 self.current_project_state.max_context_tokens = self.config_manager.get_max_context_tokens()
@@ -401,139 +409,15 @@ class OrchestrationEngine:
     def _load_mock_type_from_project_state(self):
         """
         Loads and applies a mock communicator type if specified in the current project's state.
-                # Load project state if it exists
-                try:
-                    loaded_state = load_project_state(self.current_project)
-                    if loaded_state:
-                        self.current_project_state = loaded_state
-                        logger.info(f"Loaded existing state for project '{self.current_project.name}'.")
-                        # Determine engine state based on loaded project state
-                        if self.current_project_state.current_status == EngineState.PAUSED_WAITING_USER_INPUT.name: # Use direct import name
-                             # If loaded state was waiting for input, transition to that state
-                             self._set_state(EngineState.PAUSED_WAITING_USER_INPUT, self.current_project_state.pending_user_question) # Use direct import name
-                        elif self.current_project_state.current_task_goal and self.current_project_state.current_status not in [EngineState.TASK_COMPLETE.name, EngineState.ERROR.name]: # Use direct import names
-                             # If there's a goal and not in a terminal state, resume
-                             # This is a simplification; actual resume logic might be more complex.
-                             # For now, if it was RUNNING_WAITING_LOG or similar, go back there.
-                             # If it was running, set it to RUNNING_WAITING_LOG to await next log.
-                             # If it was IDLE or PROJECT_SELECTED with a goal, maybe it should start?
-                             # Let's assume if there's a goal and status wasn't ERROR/COMPLETE, we go to WAITING_LOG
-                             # unless the status explicitly says otherwise.
-                             try:
-                                  # Attempt to map saved status string back to EngineState enum
-                                  saved_status_enum = EngineState[self.current_project_state.current_status]
-                                  if saved_status_enum == EngineState.RUNNING_WAITING_LOG:
-                                       self._set_state(EngineState.RUNNING_WAITING_LOG, "Resumed waiting for log.")
-                                       # Need to check for a pending log file that might have been written while engine was off.
-                                       # This logic should be in a dedicated resume method.
-                                  else:
-                                       self._set_state(saved_status_enum, f"Resumed in saved state: {saved_status_enum.name}")
-                             except KeyError:
-                                  logger.warning(f"Unknown saved engine state '{self.current_project_state.current_status}'. Setting to PROJECT_SELECTED.")
-                                  self._set_state(EngineState.PROJECT_SELECTED, "Unknown saved state, reset to Project Selected.")
-
-                        else:
-                             # No active task/goal or in terminal state, stay in PROJECT_SELECTED
-                             self._set_state(EngineState.PROJECT_SELECTED, "Project loaded.")
-                    else:
-                        # No saved state, start fresh for this project
-                        self.current_project_state = ProjectState(project_id=self.current_project.id)
-                        self._set_state(EngineState.PROJECT_SELECTED, "New project state created.")
-
-                except PersistenceError as e:
-                    logger.error(f"Failed to load state for project '{project_name}': {e}", exc_info=True)
-                    self._set_state(EngineState.ERROR, f"Failed to load project state: {e}")
-                    return False # Indicate failure
-                except Exception as e:
-                    logger.critical(f"Unexpected error loading project state for '{project_name}': {e}", exc_info=True)
-                    self._set_state(EngineState.ERROR, f"Unexpected error loading project state: {e}")
-                    return False # Indicate failure
-
-            except PersistenceError as e:
-                 # This outer catch handles errors during load_projects()
-                 logger.error(f"Persistence Error during project loading for {project_name}: {e}", exc_info=True)
-                 self._set_state(EngineState.ERROR, f"Persistence Error: {e}")
-                 self.current_project = None
-                 return False
-            except Exception as e:
-                 # This outer catch handles unexpected errors during load_projects()
-                 logger.critical(f"Unexpected error during project loading for {project_name}: {e}", exc_info=True)
-                 self._set_state(EngineState.ERROR, f"Unexpected error during project loading: {e}")
-                 self.current_project = None
-                 return False
-
-            # Ensure project directories exist
-            try:
-                if not self.config_manager: # Should have been caught by init
-                    raise ValueError("ConfigManager not initialized")
-                self.dev_logs_dir = os.path.join(self.current_project.workspace_root_path, self.config_manager.get_default_dev_logs_dir())
-                self.dev_instructions_dir = os.path.join(self.current_project.workspace_root_path, self.config_manager.get_default_dev_instructions_dir())
-                os.makedirs(self.dev_logs_dir, exist_ok=True)
-                os.makedirs(os.path.join(self.dev_logs_dir, "processed"), exist_ok=True)
-                os.makedirs(self.dev_instructions_dir, exist_ok=True)
-                logger.debug(f"Ensured project directories exist: Logs='{self.dev_logs_dir}', Instructions='{self.dev_instructions_dir}'")
-            except (OSError, ValueError) as e:
-                logger.error(f"File System Error: Failed to create project directories for {self.current_project.name}: {e}", exc_info=True)
-                self._set_state(EngineState.ERROR, f"File System Error: Failed to create project directories: {e}")
-                self.current_project = None
-                return False
-
-            final_state_to_set_name = self.current_project_state.current_status
-            final_state_detail = None
-            try:
-                final_state_to_set = EngineState[final_state_to_set_name]
-                logger.info(f"Project '{self.current_project.name}' loaded. Its state.json specified status: {final_state_to_set_name}")
-
-                if final_state_to_set == EngineState.PAUSED_WAITING_USER_INPUT:
-                    last_question = self._get_last_gemini_question_from_history()
-                    final_state_detail = last_question if last_question else "Gemini is waiting for your input. Please check conversation history."
-                    logger.info(f"Loaded into PAUSED_WAITING_USER_INPUT. Pending question: {final_state_detail}")
-                    self._set_state(final_state_to_set, final_state_detail)
-                # If loaded state is LOADING_PROJECT, or any other RUNNING_* state, or TASK_COMPLETE, or IDLE, transition to PROJECT_SELECTED
-                # as the context for those states is lost upon restart. Only PAUSED_WAITING_USER_INPUT is fully restorable.
-                elif final_state_to_set not in [EngineState.ERROR]: # Exclude ERROR, PAUSED handled above
-                    logger.info(f"Project loaded with state {final_state_to_set.name}. Transitioning to PROJECT_SELECTED for a clean start.")
-                    self._set_state(EngineState.PROJECT_SELECTED)
-                    self.current_project_state.current_status = EngineState.PROJECT_SELECTED.name # Persist this clean state
-                else: # Was: Preserve ERROR state if loaded. NOW: Handle loaded ERROR state by resetting.
-                    loaded_error_state_name = final_state_to_set.name
-                    logger.warning(f"Project '{self.current_project.name}' was loaded in an error state: {loaded_error_state_name}.")
-                    # Transition to IDLE to allow selection or new task.
-                    # PROJECT_SELECTED might be too presumptuous if the project data itself had an issue, though less likely here.
-                    # IDLE is a safer neutral state post-error-load.
-                    self._set_state(EngineState.IDLE)
-                    self.current_project_state.current_status = EngineState.IDLE.name # Persist this reset
-
-                    # Update main.py's display via engine attributes
-                    self.status_message_for_display = f"NOTICE: Project '{self.current_project.name}' was loaded in state {loaded_error_state_name}. Reset to IDLE."
-                    self.last_error_message = None # Clear the specific error message that led to the saved ERROR state.
-                    # The general notice is in status_message_for_display
-
-                    logger.info(f"Project '{self.current_project.name}' was in {loaded_error_state_name}, reset to IDLE. User notified.")
-
-            except KeyError:
-                 logger.error(f"Invalid state name '{final_state_to_set_name}' in project state for {self.current_project.name}. Resetting to PROJECT_SELECTED.", exc_info=True)
-                 self._set_state(EngineState.PROJECT_SELECTED)
-                 self.current_project_state.current_status = EngineState.PROJECT_SELECTED.name # Persist the correction
-
-            save_project_state(self.current_project, self.current_project_state)
-            logger.info(f"Active project successfully set. Project: '{self.current_project.name}', Engine state: '{self.state.name}'")
-
-            # Load summarization interval from config
-            self.current_project_state.summarization_interval = self.config_manager.get_summarization_interval()
-            logger.info(f"Summarization interval for project '{self.current_project.name}' set to {self.current_project_state.summarization_interval} turns.")
-
-            # Ensure project directories exist
-            self.current_project_state.dev_instructions_path = Path(self.dev_instructions_dir).resolve()
-            self.current_project_state.dev_logs_path = Path(self.dev_logs_dir).resolve()
-            self.current_project_state.cursor_output_log_path = self.current_project_state.dev_logs_path / "cursor_step_output.txt"
-            self.current_project_state.dev_instructions_path.mkdir(parents=True, exist_ok=True)
-            self.current_project_state.dev_logs_path.mkdir(parents=True, exist_ok=True)
 
-            # Add debug logging here after setting the final state during project load
-            logger.debug(f"ENGINE_TRACE: Finished set_active_project for '{project_name}'. Final state: {self.state.name}")
-
-            return True
+        If `self.current_project_state.mock_communicator_type` is set, this method
+        will attempt to apply the corresponding mock communicator using
+        `self.apply_mock_communicator()`.
+        """
+        mock_type = getattr(self.current_project_state, "mock_communicator_type", None) if self.current_project_state else None
+        if mock_type:
+            logger.info(f"Project state requests mock communicator '{mock_type}'. Applying it.")
+            self.apply_mock_communicator(mock_type)
 
     def _get_last_gemini_question_from_history(self) -> Optional[str]:
         """
@@ -722,6 +606,25 @@ class OrchestrationEngine:
              logger.critical(f"Configuration error while trying to write instruction file: {ae}", exc_info=True)
              self._set_state(EngineState.ERROR, f"Internal Configuration Error: {ae}")
 
+    LOG_FILE_STABILITY_POLL_SECONDS = 0.05
+
+    def _wait_for_log_file_stable(self, log_file_path: str, max_wait_seconds: float):
+        """Polls the file size until two consecutive reads agree on a non-zero size.
+
+        Returns as soon as the file looks fully written (typically ~2 polls) instead of
+        always sleeping for the full read delay. Gives up after `max_wait_seconds` and
+        lets the caller read whatever is there.
+        """
+        deadline = time.monotonic() + max_wait_seconds
+        last_size = os.path.getsize(log_file_path)
+        while time.monotonic() < deadline:
+            time.sleep(self.LOG_FILE_STABILITY_POLL_SECONDS)
+            size = os.path.getsize(log_file_path)
+            if size == last_size and size > 0:
+                return
+            last_size = size
+        logger.debug(f"Log file '{os.path.basename(log_file_path)}' size not stable after {max_wait_seconds}s; reading anyway.")
+
     def _on_log_file_created(self, log_file_path: str):
         logger.debug(f"_on_log_file_created triggered for: {log_file_path}")
         with self._engine_lock:
@@ -733,8 +636,8 @@ class OrchestrationEngine:
             self._set_state(EngineState.RUNNING_PROCESSING_LOG, f"Processing log file: {os.path.basename(log_file_path)}")
             
             try:
-                # Add a small delay to ensure file is fully written and closed by Cursor agent
-                time.sleep(self.config_manager.get_log_file_read_delay_seconds()) 
+                # Wait until the Cursor agent has finished writing the file (bounded by the configured read delay)
+                self._wait_for_log_file_stable(log_file_path, self.config_manager.get_log_file_read_delay_seconds())
                 with open(log_file_path, 'r', encoding='utf-8') as f:
                     log_content = f.read()
                 logger.debug(f"Successfully read log file. Content length: {len(log_content)}")
@@ -768,11 +671,11 @@ class OrchestrationEngine:
                 self._set_state(EngineState.ERROR, error_msg)
 
     def _process_cursor_log(self, log_content: str):
-        print(f"DEBUG_PCL: _process_cursor_log ENTERED. Log content snippet: {log_content[:100]}", file=sys.stderr, flush=True)
+        logger.debug("DEBUG_PCL: _process_cursor_log ENTERED. Log content snippet: %.100s", log_content)
         logger.info(f"PCL_INFO: _process_cursor_log ENTERED. Log content snippet: {log_content[:100]}")
 
         with self._engine_lock:
-            print(f"DEBUG_PCL: _engine_lock ACQUIRED. Current state: {self.state.name}", file=sys.stderr, flush=True)
+            logger.debug("DEBUG_PCL: _engine_lock ACQUIRED. Current state: %s", self.state.name)
             logger.info(f"PCL_INFO: _engine_lock ACQUIRED. Current state: {self.state.name}")
 
             if not self.current_project or not self.current_project_state:
@@ -796,19 +699,19 @@ class OrchestrationEngine:
                     self.pending_log_for_resumed_step = None # Clear any pending log
 
                     project_goal = self.current_project.overall_goal
-                    history_copy = list(self.current_project_state.conversation_history)
                     current_summary = self.current_project_state.current_summary
                     max_hist_turns = self.config_manager.get_max_history_turns()
+                    history_copy = self._recent_history_snapshot(max_hist_turns)
                     max_ctx_tokens = self.config_manager.get_max_context_tokens()
                     initial_project_structure_overview = None
 
                     self._gemini_call_thread = threading.Thread(
-                        target=self._call_gemini_in_thread,
+                        target=self._run_gemini_call,
                         args=(
+                            self._new_gemini_response_future(),
                             project_goal, history_copy, current_summary, 
                             max_hist_turns, max_ctx_tokens,
                             log_content, initial_project_structure_overview, 
-                            self._gemini_response_queue,
                             False # is_summarization_call = False
                         ),
                         daemon=True, name=f"GeminiLogProcNextStepThread-{uuid.uuid4().hex[:8]}"
@@ -816,7 +719,7 @@ class OrchestrationEngine:
                     self._gemini_call_thread.start()
                     logger.info(f"PCL_INFO: Started Gemini call thread for NEXT STEP. Thread: {self._gemini_call_thread.name}")
             else:
-                print(f"DEBUG_PCL: State is NOT RUNNING_WAITING_LOG (it is {self.state.name}). Not taking action in _process_cursor_log.", file=sys.stderr, flush=True)
+                logger.debug("DEBUG_PCL: State is NOT RUNNING_WAITING_LOG (it is %s). Not taking action in _process_cursor_log.", self.state.name)
                 logger.warning(f"PCL_WARN: State is NOT RUNNING_WAITING_LOG (it is {self.state.name}). Not taking action in _process_cursor_log.")
 
     def _initiate_summarization_if_needed_and_set_state(self) -> bool:
@@ -851,8 +754,9 @@ class OrchestrationEngine:
                 # Simplest: add 'is_summarization_call=True' to _call_gemini_in_thread
                 # And modify _call_gemini_in_thread to use it.
                 self._gemini_call_thread = threading.Thread(
-                    target=self._call_gemini_in_thread, # This thread will call the actual summarization
+                    target=self._run_gemini_call, # This thread will call the actual summarization
                     args=(
+                        self._new_gemini_response_future(),
                         project_goal, 
                         history_copy, 
                         current_summary, 
@@ -860,7 +764,6 @@ class OrchestrationEngine:
                         max_tokens, # Max tokens for summary
                         None, # No specific cursor_log_content for summary call
                         None, # No initial_project_structure_overview for summary call
-                        self._gemini_response_queue, # Main queue
                         True # is_summarization_call = True
                     ),
                     daemon=True,
@@ -871,10 +774,19 @@ class OrchestrationEngine:
                 return True
             return False
 
+    def _new_gemini_response_future(self) -> Future:
+        """Creates the Future that the next Gemini call thread resolves, replacing the previous one."""
+        self._gemini_response_future = Future()
+        return self._gemini_response_future
+
+    def _run_gemini_call(self, response_future: Future, *call_args):
+        """Thread target: runs `_call_gemini_in_thread` and hands its response over via `response_future`."""
+        response_future.set_result(self._call_gemini_in_thread(*call_args))
+
     def _call_gemini_in_thread(self, project_goal, full_history, current_summary, 
                                max_history_turns, max_context_tokens, 
                                cursor_log_content, initial_project_structure_overview, 
-                               q_to_use: queue.Queue, is_summarization_call: bool = False):
+                               is_summarization_call: bool = False) -> Dict[str, Any]:
         trace_id = uuid.uuid4().hex[:8]
         logger.info(f"GEMINI_THREAD ({trace_id}): STARTING. Summarization call: {is_summarization_call}. Goal: {project_goal[:30]}...")
         response = None
@@ -906,35 +818,30 @@ class OrchestrationEngine:
                 if isinstance(response, dict):
                     response['id'] = trace_id 
             
-            logger.info(f"GEMINI_THREAD ({trace_id}): Call complete. Response: {str(response)[:200]}...")
-            q_to_use.put(response)
-            logger.info(f"GEMINI_THREAD ({trace_id}): Response put on queue.")
+            logger.info(f"GEMINI_THREAD ({trace_id}): Call complete.")
+            logger.debug("GEMINI_THREAD (%s): Response: %.200s...", trace_id, response)
+            return response
 
         except Exception as e_thread_gemini_call:
-            logger.error(f"GEMINI_THREAD ({trace_id}): EXCEPTION during Gemini call or queue put: {e_thread_gemini_call}", exc_info=True)
-            # Put an error indicator on the queue so the main thread doesn't hang indefinitely
-            error_response = {
+            logger.error(f"GEMINI_THREAD ({trace_id}): EXCEPTION during Gemini call: {e_thread_gemini_call}", exc_info=True)
+            # Return an error indicator so the waiting caller doesn't hang indefinitely
+            return {
                 "status": "THREAD_EXCEPTION", 
                 "error": str(e_thread_gemini_call),
                 "id": trace_id
             }
-            try:
-                q_to_use.put(error_response) 
-                logger.info(f"GEMINI_THREAD ({trace_id}): THREAD_EXCEPTION response put on queue.")
-            except Exception as e_queue_put_error:
-                logger.error(f"GEMINI_THREAD ({trace_id}): CRITICAL - Failed to put THREAD_EXCEPTION on queue: {e_queue_put_error}", exc_info=True)
         finally:
             logger.info(f"GEMINI_THREAD ({trace_id}): FINISHED.")
 
     def _process_gemini_response(self, response_data: Dict[str, Any]):
         # (PGR_ENTRY and PRE_LOCK logs from before)
-        print(f"DEBUG_PGR_ENTRY: _process_gemini_response. Action: {response_data.get('next_step_action')}", file=sys.stderr, flush=True)
+        logger.debug("DEBUG_PGR_ENTRY: _process_gemini_response. Action: %s", response_data.get('next_step_action'))
         logger.critical(f"PGR_CRIT: _process_gemini_response ENTRY. Action: {response_data.get('next_step_action')}")
-        print("DEBUG_PGR_PRE_LOCK: Attempting to acquire _engine_lock", file=sys.stderr, flush=True)
+        logger.debug("DEBUG_PGR_PRE_LOCK: Attempting to acquire _engine_lock")
         logger.info("PGR_INFO: PRE_LOCK Attempting to acquire _engine_lock")
 
         with self._engine_lock:
-            print("DEBUG_PGR_POST_LOCK: Acquired _engine_lock", file=sys.stderr, flush=True)
+            logger.debug("DEBUG_PGR_POST_LOCK: Acquired _engine_lock")
             logger.info("PGR_INFO: POST_LOCK Acquired _engine_lock")
             logger.info(f"PGR_INFO_STATE: Current engine state: {self.state.name}. Action: {response_data.get('next_step_action')}")
             logger.info(f"PGR_TRACE: Received response_data keys: {list(response_data.keys()) if response_data else 'None'}")
@@ -954,87 +861,117 @@ class OrchestrationEngine:
                 self._set_state(EngineState.ERROR, f"Gemini Error: {error_msg}")
                 return
 
-            if action == "SUMMARY_COMPLETE":
-                if self.state != EngineState.SUMMARIZING_CONTEXT:
-                    logger.warning(f"PGR_WARN ({trace_id}): Received SUMMARY_COMPLETE but state is {self.state.name}. Updating summary anyway.")
-                
-                summary_text = response_data.get("summary")
-                if summary_text is not None:
-                    self.current_project_state.current_summary = summary_text
-                    self.current_project_state.gemini_turns_since_last_summary = 0 # Corrected attribute
-                    logger.info(f"PGR_INFO ({trace_id}): Context summary updated. Length: {len(summary_text)}. Turns reset.")
-                    save_project_state(self.current_project, self.current_project_state)
-                else:
-                    logger.error(f"PGR_ERROR ({trace_id}): SUMMARY_COMPLETE action but no summary text in response.")
-
-                resumed_log_content = self.pending_log_for_resumed_step
-                if resumed_log_content:
-                    self.pending_log_for_resumed_step = None
-                    logger.info(f"PGR_INFO ({trace_id}): Summary complete, resuming deferred next step call with stored log.")
-                    self._set_state(EngineState.RUNNING_CALLING_GEMINI, "Resuming with stored log after summarization.")
-                    
-                    project_goal = self.current_project.overall_goal
-                    history_copy = list(self.current_project_state.conversation_history)
-                    # current_summary is now the NEW summary
-                    max_hist_turns = self.config_manager.get_max_history_turns()
-                    max_ctx_tokens = self.config_manager.get_max_context_tokens()
-                    initial_project_structure_overview = None 
+            handler = self._gemini_action_handlers.get(action, self._handle_unknown_action)
+            handler(response_data, trace_id)
 
-                    self._gemini_call_thread = threading.Thread(
-                        target=self._call_gemini_in_thread,
-                        args=(
-                            project_goal, history_copy, self.current_project_state.current_summary, 
-                            max_hist_turns, max_ctx_tokens,
-                            resumed_log_content, initial_project_structure_overview, 
-                            self._gemini_response_queue,
-                            False # is_summarization_call = False
-                        ),
-                        daemon=True, name=f"GeminiResumedLogProcThread-{uuid.uuid4().hex[:8]}"
-                    )
-                    self._gemini_call_thread.start()
-                else:
-                    logger.info(f"PGR_INFO ({trace_id}): Summary complete. No pending log to resume. Setting state to RUNNING_WAITING_LOG.")
-                    self._set_state(EngineState.RUNNING_WAITING_LOG, "Summary complete, awaiting next log/action.")
-                    self._start_cursor_timeout() # Restart timeout as we are waiting for a log again
+    # --- Gemini action handlers (called from _process_gemini_response with _engine_lock held) ---
 
-            elif action == "WRITE_TO_FILE":
-                if self.state not in [EngineState.RUNNING_CALLING_GEMINI, EngineState.RUNNING_WAITING_INITIAL_GEMINI]:
-                     logger.warning(f"PGR_WARN ({trace_id}): Received WRITE_TO_FILE but current state is {self.state.name}. Proceeding to write.")
-                
-                instruction = response_data.get("instruction")
-                if instruction:
-                    logger.info(f"PGR_INFO ({trace_id}): Instruction found in Gemini response: '{instruction[:100]}...' Action: {action}")
-                    self._write_instruction_file(instruction)
-                    self._add_to_history("GEMINI", instruction, needs_user_input=False)
-                    self._set_state(EngineState.RUNNING_WAITING_LOG, "Wrote instruction, waiting for cursor log.")
-                    self._start_cursor_timeout()
-                else:
-                    logger.error(f"PGR_ERROR ({trace_id}): Action was WRITE_TO_FILE but no instruction provided.")
-                    self._set_state(EngineState.ERROR, "Gemini Error: Missing instruction for WRITE_TO_FILE.")
+    def _handle_summary_complete(self, response_data: Dict[str, Any], trace_id: str):
+        if self.state != EngineState.SUMMARIZING_CONTEXT:
+            logger.warning(f"PGR_WARN ({trace_id}): Received SUMMARY_COMPLETE but state is {self.state.name}. Updating summary anyway.")
+        
+        summary_text = response_data.get("summary")
+        if summary_text is not None:
+            self.current_project_state.current_summary = summary_text
+            self.current_project_state.gemini_turns_since_last_summary = 0 # Corrected attribute
+            logger.info(f"PGR_INFO ({trace_id}): Context summary updated. Length: {len(summary_text)}. Turns reset.")
+            save_project_state(self.current_project, self.current_project_state)
+        else:
+            logger.error(f"PGR_ERROR ({trace_id}): SUMMARY_COMPLETE action but no summary text in response.")
+
+        resumed_log_content = self.pending_log_for_resumed_step
+        if resumed_log_content:
+            self.pending_log_for_resumed_step = None
+            logger.info(f"PGR_INFO ({trace_id}): Summary complete, resuming deferred next step call with stored log.")
+            self._set_state(EngineState.RUNNING_CALLING_GEMINI, "Resuming with stored log after summarization.")
             
-            # ... (handle other actions like REQUEST_USER_INPUT, TASK_COMPLETE, FATAL_ERROR) ...
-            elif action == "REQUEST_USER_INPUT":
-                # ... (similar logic, set state PAUSED_WAITING_USER_INPUT) ...
-                pass # Placeholder
-            elif action == "TASK_COMPLETE":
-                # ... (set state TASK_COMPLETE) ...
-                pass # Placeholder
-            elif action == "FATAL_ERROR":
-                # ... (set state ERROR) ... Already handled by error check at top if error field present
-                logger.error(f"PGR_ERROR ({trace_id}): FATAL_ERROR action received.")
-                self._set_state(EngineState.ERROR, response_data.get("error", "Fatal error from Gemini, no details."))
-
-            else: # Unknown or unhandled action
-                if not response_data.get("error"): # Avoid double logging if already handled as an error
-                    logger.error(f"PGR_ERROR ({trace_id}): Unknown or unhandled Gemini action: '{action}'. Response: {str(response_data)[:200]}")
-                    self._set_state(EngineState.ERROR, f"Unhandled Gemini Action: {action}")
+            project_goal = self.current_project.overall_goal
+            # current_summary is now the NEW summary
+            max_hist_turns = self.config_manager.get_max_history_turns()
+            history_copy = self._recent_history_snapshot(max_hist_turns)
+            max_ctx_tokens = self.config_manager.get_max_context_tokens()
+            initial_project_structure_overview = None 
+
+            self._gemini_call_thread = threading.Thread(
+                target=self._run_gemini_call,
+                args=(
+                    self._new_gemini_response_future(),
+                    project_goal, history_copy, self.current_project_state.current_summary, 
+                    max_hist_turns, max_ctx_tokens,
+                    resumed_log_content, initial_project_structure_overview, 
+                    False # is_summarization_call = False
+                ),
+                daemon=True, name=f"GeminiResumedLogProcThread-{uuid.uuid4().hex[:8]}"
+            )
+            self._gemini_call_thread.start()
+        else:
+            logger.info(f"PGR_INFO ({trace_id}): Summary complete. No pending log to resume. Setting state to RUNNING_WAITING_LOG.")
+            self._set_state(EngineState.RUNNING_WAITING_LOG, "Summary complete, awaiting next log/action.")
+            self._start_cursor_timeout() # Restart timeout as we are waiting for a log again
+
+    def _handle_write_to_file(self, response_data: Dict[str, Any], trace_id: str):
+        if self.state not in [EngineState.RUNNING_CALLING_GEMINI, EngineState.RUNNING_WAITING_INITIAL_GEMINI]:
+             logger.warning(f"PGR_WARN ({trace_id}): Received WRITE_TO_FILE but current state is {self.state.name}. Proceeding to write.")
+        
+        instruction = response_data.get("instruction")
+        if instruction:
+            logger.info(f"PGR_INFO ({trace_id}): Instruction found in Gemini response: '{instruction[:100]}...' Action: WRITE_TO_FILE")
+            self._write_instruction_file(instruction)
+            self._add_to_history("GEMINI", instruction, needs_user_input=False)
+            self._set_state(EngineState.RUNNING_WAITING_LOG, "Wrote instruction, waiting for cursor log.")
+            self._start_cursor_timeout()
+        else:
+            logger.error(f"PGR_ERROR ({trace_id}): Action was WRITE_TO_FILE but no instruction provided.")
+            self._set_state(EngineState.ERROR, "Gemini Error: Missing instruction for WRITE_TO_FILE.")
+
+    def _handle_request_user_input(self, response_data: Dict[str, Any], trace_id: str):
+        question = response_data.get("clarification_question")
+        if not question:
+            logger.error(f"PGR_ERROR ({trace_id}): Action was REQUEST_USER_INPUT but no question provided.")
+            self._set_state(EngineState.ERROR, "Gemini Error: Missing question for REQUEST_USER_INPUT.")
+            return
+
+        logger.info(f"PGR_INFO ({trace_id}): Gemini requested user input: '{question[:100]}...'")
+        self._add_to_history("GEMINI", response_data.get("full_response_for_history") or question, needs_user_input=True)
+        if self.current_project_state:
+            self.current_project_state.pending_user_question = question # Persisted by _set_state so a reload resumes the pause
+        self._set_state(EngineState.PAUSED_WAITING_USER_INPUT, question)
+
+    def _handle_task_complete(self, response_data: Dict[str, Any], trace_id: str):
+        completion_message = response_data.get("completion_message") or "Task complete."
+        logger.info(f"PGR_INFO ({trace_id}): Gemini reported the task complete: '{completion_message[:100]}...'")
+        self._add_to_history("GEMINI", response_data.get("full_response_for_history") or completion_message, needs_user_input=False)
+        self._cancel_cursor_timeout()
+        self._set_state(EngineState.TASK_COMPLETE, completion_message)
+
+    def _handle_fatal_error(self, response_data: Dict[str, Any], trace_id: str):
+        # ... (set state ERROR) ... Already handled by error check at top if error field present
+        logger.error(f"PGR_ERROR ({trace_id}): FATAL_ERROR action received.")
+        self._set_state(EngineState.ERROR, response_data.get("error", "Fatal error from Gemini, no details."))
+
+    def _handle_unknown_action(self, response_data: Dict[str, Any], trace_id: str):
+        action = response_data.get("next_step_action")
+        if not response_data.get("error"): # Avoid double logging if already handled as an error
+            logger.error(f"PGR_ERROR ({trace_id}): Unknown or unhandled Gemini action: '{action}'. Response: {str(response_data)[:200]}")
+            self._set_state(EngineState.ERROR, f"Unhandled Gemini Action: {action}")
+
+    def _is_gemini_call_in_flight(self) -> bool:
+        """Returns True while a Gemini call is pending, either by engine state or a live call thread."""
+        if self.state in (EngineState.RUNNING_CALLING_GEMINI, EngineState.RUNNING_WAITING_INITIAL_GEMINI):
+            return True
+        return self._gemini_call_thread is not None and self._gemini_call_thread.is_alive()
 
     def start_task(self, initial_user_instruction: Optional[str] = None):
         """Starts a new task for the currently selected project."""
         # Add debug logging at the beginning of the method
-        logger.debug(f"ENGINE_TRACE: start_task called with initial_user_instruction: '{initial_user_instruction[:50]}...'" if initial_user_instruction else "None")
+        logger.debug("ENGINE_TRACE: start_task called with initial_user_instruction: '%.50s...'", initial_user_instruction)
 
         with self._engine_lock:
+            if self._is_gemini_call_in_flight():
+                # Duplicate/racing start: bail out before touching state or history
+                logger.warning(f"start_task ignored: a Gemini call is already in flight (state: {self.state.name}).")
+                return
+
             if self._last_critical_error:
                 self._set_state(EngineState.ERROR, self._last_critical_error)
                 return
@@ -1071,6 +1008,7 @@ class OrchestrationEngine:
                 self.current_project_state.conversation_history = [] 
                 self.current_project_state.current_summary = "" 
                 self.current_project_state.last_summary_turn_count = 0
+                self._reset_conversation_history_file(self.current_project)
             else:
                 logger.info(f"Starting task for project '{self.current_project.name}' based on overall project goal. History NOT cleared.")
 
@@ -1084,16 +1022,16 @@ class OrchestrationEngine:
 
             self._set_state(EngineState.RUNNING_CALLING_GEMINI, "Initial call to Gemini for new task.")
             self._gemini_call_thread = threading.Thread(
-                target=self._call_gemini_in_thread,
+                target=self._run_gemini_call,
                 args=(
+                    self._new_gemini_response_future(),
                     self.current_project.overall_goal,
-                    self.current_project_state.conversation_history,
+                    self._recent_history_snapshot(self.config_manager.get_max_history_turns()),
                     self.current_project_state.current_summary,
                     self.config_manager.get_max_history_turns(),
                     self.config_manager.get_max_context_tokens(),
                     None,
                     initial_project_structure_overview,
-                    self._gemini_response_queue,
                 ),
                 daemon=True,
             )
@@ -1101,8 +1039,8 @@ class OrchestrationEngine:
 
             try:
                 # Timeout for Gemini call completion
-                response_data = self._gemini_response_queue.get(timeout=self.GEMINI_CALL_TIMEOUT_SECONDS) 
-                logger.info(f"Response received from Gemini queue: {response_data.get('status') if response_data else 'N/A'}") # Restored to simpler logging
+                response_data = self._gemini_response_future.result(timeout=self.GEMINI_CALL_TIMEOUT_SECONDS) 
+                logger.info(f"Response received from Gemini call thread: {response_data.get('status') if response_data else 'N/A'}") # Restored to simpler logging
                 
                 if response_data and response_data.get("error"):
                     error_msg = response_data["error"]
@@ -1111,10 +1049,10 @@ class OrchestrationEngine:
                 elif response_data:
                     self._process_gemini_response(response_data) # Call _process_gemini_response directly
                 else: 
-                    logger.error("Response_data from queue was None. This is unexpected.") # Simplified message
+                    logger.error("Response_data from Gemini call thread was None. This is unexpected.") # Simplified message
                     self._set_state(EngineState.ERROR, "Internal Error: Empty response from Gemini task.")
 
-            except queue.Empty:
+            except FutureTimeoutError:
                 logger.error("Timeout waiting for Gemini response from thread.")
                 self._set_state(EngineState.ERROR, "Timeout waiting for Gemini response.")
             except Exception as e:
@@ -1212,7 +1150,9 @@ class OrchestrationEngine:
             gemini_comms_real_module = importlib.import_module(module_name)
             RealGeminiCommunicator = getattr(gemini_comms_real_module, 'GeminiCommunicator')
 
-            self.gemini_client = RealGeminiCommunicator()
+            # Prefer the module's shared instance so its model and gRPC channel are reused
+            get_communicator = getattr(gemini_comms_real_module, 'get_communicator', None)
+            self.gemini_client = get_communicator() if get_communicator else RealGeminiCommunicator()
             self._active_mock_type = None # Clear any mock type tracking
             logger.info(f"Successfully loaded REAL GeminiCommunicator from {module_name}. Client type: {type(self.gemini_client)}")
 
@@ -1306,8 +1246,26 @@ class OrchestrationEngine:
     def _get_timestamp(self) -> str:
         return datetime.now().isoformat()
 
+    def _recent_history_snapshot(self, max_history_turns: int) -> List[Turn]:
+        """
+        Copies only the newest `max_history_turns` turns for a next-step call.
+
+        The prompt never uses more than that window, so copying just the tail keeps the per-call
+        cost bounded by the window size instead of growing with the whole session. The full list
+        stays the archive used for persistence and summarization.
+        """
+        history = self.current_project_state.conversation_history
+        return history[-max_history_turns:] if max_history_turns > 0 else []
+
+    def _reset_conversation_history_file(self, project: Project):
+        """Empties the project's history file so a fresh state does not pick up turns from an old one."""
+        try:
+            save_conversation_history(project, [])
+        except PersistenceError as e:
+            logger.error(f"Failed to reset conversation history file for {project.name}: {e}", exc_info=True)
+
     def _add_to_history(self, sender: str, message: str, needs_user_input: bool = False):
-        """Adds a turn to the conversation history and saves project state."""
+        """Adds a turn to the conversation history and appends it to the project's history file."""
         if not self.current_project or not self.current_project_state:
             logger.warning("Attempted to add to history with no active project or state.")
             return
@@ -1319,14 +1277,17 @@ class OrchestrationEngine:
         # Logic for pending_user_question being set or cleared:
         # - Set by _process_gemini_response if action is REQUEST_USER_INPUT.
         # - Cleared here if sender is USER, or by _process_gemini_response for other actions.
+        clears_pending_question = sender == "USER" and self.current_project_state.pending_user_question is not None
         if sender == "USER":
             self.current_project_state.pending_user_question = None 
 
         try:
-            save_project_state(self.current_project, self.current_project_state)
+            append_turn(self.current_project, turn, full_history=self.current_project_state.conversation_history)
+            if clears_pending_question:
+                save_project_state(self.current_project, self.current_project_state)
             logger.debug(f"Added to history for {self.current_project.name}: [{sender}] - '{message[:50]}...'. History len: {len(self.current_project_state.conversation_history)}")
         except PersistenceError as e:
-            logger.error(f"Failed to save project state after adding to history for {self.current_project.name}: {e}", exc_info=True)
+            logger.error(f"Failed to persist history turn for {self.current_project.name}: {e}", exc_info=True)
 
     def _start_cursor_timeout(self):
         with self._engine_lock:
@@ -1383,9 +1344,9 @@ class OrchestrationEngine:
 
                 # Prepare args for Gemini call
                 project_goal = self.current_project.overall_goal
-                history_copy = list(self.current_project_state.conversation_history)
                 current_summary = self.current_project_state.current_summary
                 max_hist_turns = self.config_manager.get_max_history_turns()
+                history_copy = self._recent_history_snapshot(max_hist_turns)
                 max_ctx_tokens = self.config_manager.get_max_context_tokens()
                 
                 # Special log content for Gemini indicating timeout
@@ -1397,13 +1358,13 @@ class OrchestrationEngine:
                 )
 
                 self._gemini_call_thread = threading.Thread(
-                    target=self._call_gemini_in_thread,
+                    target=self._run_gemini_call,
                     args=(
+                        self._new_gemini_response_future(),
                         project_goal, history_copy, current_summary, 
                         max_hist_turns, max_ctx_tokens,
                         timeout_log_for_gemini, # Use the special timeout log
                         None, # No initial project structure overview for this call
-                        self._gemini_response_queue,
                         False # is_summarization_call = False
                     ),
                     daemon=True, name=f"GeminiCursorTimeoutHandlerThread-{uuid.uuid4().hex[:8]}"
@@ -1641,44 +1602,5 @@ class OrchestrationEngine:
             print(f"Error: Invalid command '{command}'. Type 'help' for a list of commands.")
             return False
 
-    def _initialize_project_state_and_dirs(self, project_to_load: Project):
-        """
-        Initializes the project state and associated directories for a newly selected project.
-
-        This involves:
-        - Loading the existing project state or creating a new one if it doesn't exist.
-        - Setting up paths for `dev_logs_dir` and `dev_instructions_dir` within the project.
-        - Ensuring these directories exist.
-        - Loading the mock communicator type from the project state if specified.
-
-        Args:
-            project_to_load: The Project object that has been selected.
-        """
-        logger.debug(f"_initialize_project_state_and_dirs for project: {project_to_load.name}")
-        # ... existing code ...
-        return True # Project initialized successfully
-
-    def _setup_project_directories(self):
-        """
-        Ensures that the development log and instruction directories exist for the current project.
-
-        Uses `dev_logs_dir` and `dev_instructions_dir` attributes of the engine.
-        Logs errors and sets the engine to an ERROR state if directories cannot be created.
-        """
-        if not self.current_project:
-            # ... existing code ...
-            self._set_state(EngineState.ERROR, msg)
-
-    def _load_mock_type_from_project_state(self):
-        """
-        Loads and applies a mock communicator type if specified in the current project's state.
-
-        If `self.current_project_state.mock_communicator_type` is set, this method
-        will attempt to apply the corresponding mock communicator using
-        `self.apply_mock_communicator()`.
-        """
-        if self.current_project_state and self.current_project_state.mock_communicator_type:
-            # ... existing code ...
-
 # Removed dummy_gui_callback and if __name__ == '__main__' block for OrchestrationEngine
 # This module is intended to be imported, not run directly as the main script.
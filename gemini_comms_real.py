@@ -1,14 +1,36 @@
-import google.generativeai as genai
-import google.api_core.exceptions
+import asyncio
+import datetime
+import functools
+import hashlib
+import io
 import logging
 import os
-from typing import Optional, Dict, Any, List
+import random
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional, Dict, Any, List, Tuple
 
-from config_manager import ConfigManager
+from config_manager import get_config_manager
 from models import Turn # Assuming Turn model is defined appropriately
 
 logger = logging.getLogger(__name__)
 
+@functools.lru_cache(maxsize=1)
+def _genai():
+    """Imports google.generativeai on first use, so mock/placeholder-key runs never load the SDK."""
+    import google.generativeai as genai
+    return genai
+
+@functools.lru_cache(maxsize=1)
+def _api_exceptions():
+    """google.api_core.exceptions, imported on first use (it loads grpc when available)."""
+    import google.api_core.exceptions
+    return google.api_core.exceptions
+
 # Markers for parsing Gemini's special responses
 GEMINI_MARKER_NEED_INPUT = "NEED_USER_INPUT:"
 GEMINI_MARKER_TASK_COMPLETE = "TASK_COMPLETE"
@@ -60,16 +82,372 @@ Your primary role is to break down the user's overall goal into a sequence of pr
 *   **Cursor Log Content:** When `cursor_log_content` is provided, it's the output from the *Cursor tool* executing your *previous* instruction. Analyze it carefully to determine the next step.
 """
 
+# Transient API failures that are safe to retry (the next-step call has no side effects)
+@functools.lru_cache(maxsize=1)
+def _retryable_api_errors() -> Tuple[type, ...]:
+    api_exceptions = _api_exceptions()
+    return (
+        api_exceptions.ResourceExhausted, # 429
+        api_exceptions.InternalServerError, # 500
+        api_exceptions.ServiceUnavailable, # 503
+        api_exceptions.DeadlineExceeded, # 504
+    )
+
+# Matches the leading control marker of a Gemini reply in one pass; `lastgroup` names the marker
+_RESPONSE_MARKER_RE = re.compile(
+    f"(?P<need_input>{re.escape(GEMINI_MARKER_NEED_INPUT)})"
+    f"|(?P<task_complete>{re.escape(GEMINI_MARKER_TASK_COMPLETE)})"
+    f"|(?P<system_error>{re.escape(GEMINI_MARKER_SYSTEM_ERROR)})"
+)
+
+# Constant pieces of the next-step prompt, built once at import instead of on every call
+_HISTORY_SENDER_LABELS = {
+    "user": "User",
+    "assistant": "Your Previous Instruction/Response",
+    "GEMINI_MANAGER": "Your Previous Instruction/Response", # Treat as assistant's turn
+    "cursor_log": "Cursor Tool Output",
+    "system": "System Message"
+}
+_ASSISTANT_SENDERS = frozenset(("assistant", "GEMINI_MANAGER"))
+# Relabels our own earlier marker replies in history, keyed by _RESPONSE_MARKER_RE group name
+_PREVIOUS_MARKER_LABELS = {
+    "need_input": "Your Previous Question to User: ",
+    "task_complete": "Your Previous Task Completion Statement: ",
+}
+# Ensure safety settings are reasonable if not using defaults (shared by next-step and summary calls)
+_SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+_CURSOR_LOG_TRUNCATION_NOTE = "[... earlier Cursor output truncated to fit the context budget ...]\n"
+_NEXT_STEP_PROMPT_FOOTER = "\n".join([
+    "\n--- Your Next Step ---",
+    "Based on all the above, provide your next instruction OR use one of the special markers (NEED_USER_INPUT:, TASK_COMPLETE, SYSTEM_ERROR:)."
+])
+
+class GeminiResponseCache:
+    """
+    Thread-safe, in-memory LRU cache of parsed next-step responses keyed by prompt hash.
+
+    A hit means the exact same prompt (goal, overview, summary, recent history and Cursor
+    log) was already answered by the same model within `ttl_seconds`, so the API round
+    trip can be skipped. Entries are evicted oldest-first beyond `max_entries`. Disabled
+    unless `ttl_seconds` is positive.
+    """
+    def __init__(self, ttl_seconds: float = 0, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_entries > 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @staticmethod
+    def make_key(*key_parts: str) -> str:
+        return hashlib.sha256("\x00".join(key_parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, response = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(response) # Callers (the engine) annotate the dict, so hand out copies
+
+    def set(self, key: str, response: Dict[str, Any]):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), dict(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SummaryDiskCache:
+    """
+    SQLite-backed cache of summaries keyed by summarization prompt hash.
+
+    The summary is rebuilt from the persisted history after a restart, so the same prompt
+    recurs; a hit returns the earlier summary without a Gemini call. The database is only
+    opened (and created) on first use, so runs that never summarize leave no file behind.
+    Any SQLite error disables the cache for the rest of the session instead of failing
+    summarization.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._disabled = not db_path
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return not self._disabled
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        """Returns the connection, opening the database on first use. Callers hold `_lock`."""
+        if self._connection is None and not self._disabled:
+            try:
+                db_dir = os.path.dirname(self.db_path)
+                if db_dir:
+                    os.makedirs(db_dir, exist_ok=True)
+                self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._connection.execute("CREATE TABLE IF NOT EXISTS summaries (key TEXT PRIMARY KEY, summary TEXT NOT NULL, created_at REAL NOT NULL)")
+                self._connection.commit()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"SummaryDiskCache: Could not open '{self.db_path}', summary cache disabled: {e}")
+                self._disable_connection()
+        return self._connection
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            connection = self._open()
+            if connection is None:
+                return None
+            try:
+                row = connection.execute("SELECT summary FROM summaries WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error as e:
+                self._disable(e)
+                return None
+        return row[0] if row else None
+
+    def set(self, key: str, summary: str):
+        if not self.enabled:
+            return
+        with self._lock:
+            connection = self._open()
+            if connection is None:
+                return
+            try:
+                connection.execute("INSERT OR REPLACE INTO summaries (key, summary, created_at) VALUES (?, ?, ?)", (key, summary, time.time()))
+                connection.commit()
+            except sqlite3.Error as e:
+                self._disable(e)
+
+    def _disable(self, error: Exception):
+        logger.warning(f"SummaryDiskCache: SQLite error on '{self.db_path}', summary cache disabled: {error}")
+        self._disable_connection()
+
+    def _disable_connection(self):
+        self._disabled = True
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except sqlite3.Error:
+                pass
+        self._connection = None
+
+class GeminiRateLimiter:
+    """
+    Client-side token bucket for Gemini's requests-per-minute and tokens-per-minute quotas.
+
+    Callers reserve capacity before each call and wait out any deficit, so requests are spread
+    under the quota instead of tripping 429s. Live calls all run on the communicator's single
+    GeminiEventLoop thread and reserve through `acquire`; the threading lock keeps reservations
+    consistent if `acquire_blocking` is also used from another thread.
+    A limit of 0 disables that bucket.
+    """
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_allowance = float(requests_per_minute)
+        self._token_allowance = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self, estimated_tokens: int) -> float:
+        """Takes capacity for one call and returns how long the caller must wait before sending it."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._last_refill
+            self._last_refill = now
+            wait_seconds = max(0.0, self._blocked_until - now)
+
+            if self.requests_per_minute > 0:
+                rate = self.requests_per_minute / 60.0
+                self._request_allowance = min(float(self.requests_per_minute), self._request_allowance + elapsed * rate)
+                self._request_allowance -= 1
+                if self._request_allowance < 0:
+                    wait_seconds = max(wait_seconds, -self._request_allowance / rate)
+
+            if self.tokens_per_minute > 0:
+                rate = self.tokens_per_minute / 60.0
+                self._token_allowance = min(float(self.tokens_per_minute), self._token_allowance + elapsed * rate)
+                self._token_allowance -= min(estimated_tokens, self.tokens_per_minute) # A single oversize prompt must still be admissible
+                if self._token_allowance < 0:
+                    wait_seconds = max(wait_seconds, -self._token_allowance / rate)
+            return wait_seconds
+
+    async def acquire(self, estimated_tokens: int):
+        wait_seconds = self._reserve(estimated_tokens)
+        if wait_seconds > 0:
+            logger.info(f"GeminiRateLimiter: Throttling call for {wait_seconds:.2f}s to stay under quota.")
+            await asyncio.sleep(wait_seconds)
+
+    def acquire_blocking(self, estimated_tokens: int):
+        wait_seconds = self._reserve(estimated_tokens)
+        if wait_seconds > 0:
+            logger.info(f"GeminiRateLimiter: Throttling call for {wait_seconds:.2f}s to stay under quota.")
+            time.sleep(wait_seconds)
+
+    def penalize(self, retry_delay_seconds: float):
+        """Holds back all new calls for `retry_delay_seconds` after the server reported a quota hit."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_delay_seconds)
+
+@functools.lru_cache(maxsize=1)
+def _next_step_generation_config(max_output_tokens: int):
+    return _genai().types.GenerationConfig(
+        max_output_tokens=max_output_tokens, # Caps worst-case generation time for a runaway reply
+        # temperature=self.config.get_temperature_gemini(),             # Use config
+        # Add other relevant generation parameters from config if needed
+    )
+
+@functools.lru_cache(maxsize=8)
+def _summary_generation_config(max_tokens: int):
+    """One GenerationConfig per distinct summary length instead of a new one per call."""
+    return _genai().types.GenerationConfig(
+        max_output_tokens=max_tokens,
+        # temperature=0.5 # Slightly lower temperature for factual summarization
+    )
+
+_chars_per_token_by_model: Dict[str, float] = {}
+
+def _measured_chars_per_token(model_name: str) -> float:
+    """Chars-per-token for `model_name`, measured with `count_tokens` once per process. Failures are not cached."""
+    chars_per_token = _chars_per_token_by_model.get(model_name)
+    if chars_per_token is None:
+        # A plain model instance, so no system instruction is counted along with the sample
+        sample_tokens = _genai().GenerativeModel(model_name).count_tokens(CURSOR_SOP_PROMPT_TEXT).total_tokens
+        chars_per_token = len(CURSOR_SOP_PROMPT_TEXT) / sample_tokens if sample_tokens > 0 else GeminiCommunicator.DEFAULT_CHARS_PER_TOKEN
+        _chars_per_token_by_model[model_name] = chars_per_token
+    return chars_per_token
+
+def _project_goal_line(project_goal: str) -> str:
+    return f"User's Overall Project Goal: {project_goal}"
+
+def _candidate_text(response) -> str:
+    """
+    Reads a response's (or streamed chunk's) text straight from its first candidate's parts.
+    `response.text` re-validates the whole response object on every access and raises on blocked
+    or empty candidates; here those just yield "".
+    """
+    candidates = response.candidates
+    if not candidates:
+        return ""
+    content = candidates[0].content
+    if not content or not content.parts:
+        return ""
+    return "".join(part.text for part in content.parts)
+
+def _system_error_response(message: str, error: Optional[str] = None) -> Dict[str, Any]:
+    """SYSTEM_ERROR result in the shape the engine expects; `error` feeds its last_error_message."""
+    error_content = f"{GEMINI_MARKER_SYSTEM_ERROR} {message}"
+    response = {
+        "status": "ERROR", # Internal status for engine
+        "next_step_action": "SYSTEM_ERROR", # To guide engine's state machine
+        "content": error_content,
+        "full_response_for_history": error_content
+    }
+    if error is not None:
+        response["error"] = error
+    return response
+
+def _log_token_usage(response):
+    """Logs prompt/cached/output token counts, showing whether implicit or explicit caching is hitting."""
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    logger.info(f"GeminiComms: Token usage - prompt: {usage.prompt_token_count} "
+                f"(cached: {getattr(usage, 'cached_content_token_count', 0)}), output: {usage.candidates_token_count}.")
+
+def _cancel_streaming_call(response):
+    """
+    Cancels the RPC behind a streamed response that is abandoned early. The SDK keeps it on the
+    private `_iterator`; on the gRPC transport that is a call object with `cancel()`.
+    """
+    cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+    if cancel is None:
+        return
+    try:
+        cancel()
+    except Exception as e:
+        logger.debug(f"GeminiComms: Could not cancel abandoned streaming call: {e}")
+
+def _retry_delay_from_error(error: Exception, default_seconds: float) -> float:
+    """Extracts the server-suggested `retry_delay { seconds: N }` from a 429 error, if present."""
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", str(error))
+    return float(match.group(1)) if match else default_seconds
+
 class GeminiCommunicator:
+    RATE_LIMIT_DEFAULT_BACKOFF_SECONDS = 10.0
+    MAX_CALL_ATTEMPTS = 6
+    RETRY_BACKOFF_MIN_SECONDS = 1.0
+    RETRY_BACKOFF_MAX_SECONDS = 32.0
+    PROMPT_HEADER_CACHE_SIZE = 8
+    GOAL_CACHED_MODELS_SIZE = 4 # Explicit prompt caches kept per communicator; the oldest goal's is deleted beyond this
+    CONTEXT_FILL_RATIO = 0.95 # Leave headroom for the local token estimate being low
+    DEFAULT_CHARS_PER_TOKEN = 4.0
+    RETRY_BUDGET_SECONDS = 45.0 # Stay inside the engine's 60s GEMINI_CALL_TIMEOUT_SECONDS
+    CALL_TIMEOUT_SECONDS = RETRY_BUDGET_SECONDS + 10.0 # Budget plus one final attempt; strictly under the engine's 60s wait so its SYSTEM_ERROR reply arrives first
+
     def __init__(self):
         logger.info("GeminiCommunicator initializing...")
-        self.config = ConfigManager()
+        self.config = get_config_manager()
         self.model = None
+        self.summary_model = None # Plain model (no SOP system instruction) for summarization calls
+        self.sop_in_system_instruction = False
+        self.chars_per_token = self.DEFAULT_CHARS_PER_TOKEN # Calibrated against count_tokens once the model loads
+        self.history_token_budget = self.config.get_history_token_budget()
+        self.max_output_tokens = self.config.get_max_output_tokens_gemini()
+        self.explicit_prompt_cache_enabled = self.config.get_explicit_prompt_cache_enabled()
+        self.explicit_prompt_cache_ttl_minutes = self.config.get_explicit_prompt_cache_ttl_minutes()
+        self._goal_cached_models: Dict[str, Tuple[Any, float, Any]] = {} # project_goal -> (model bound to cached context, refresh deadline, CachedContent)
+        self._prompt_header_cache: Dict[Tuple[bool, bool, str, Optional[str], Optional[str]], str] = {}
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._event_loop_lock = threading.Lock()
+        self.rate_limiter = GeminiRateLimiter(
+            requests_per_minute=self.config.get_gemini_requests_per_minute(),
+            tokens_per_minute=self.config.get_gemini_tokens_per_minute()
+        )
         self.model_name = "" # Initialize before try block
+        self.summary_model_name = ""
+        self.response_cache = GeminiResponseCache(
+            ttl_seconds=self.config.get_gemini_response_cache_ttl_seconds(),
+            max_entries=self.config.get_gemini_response_cache_max_entries()
+        )
+        self.summary_cache = SummaryDiskCache(self.config.get_summary_cache_path())
 
         try:
             api_key = self.config.get_api_key()
             self.model_name = self.config.get_gemini_model()
+            self.summary_model_name = self.config.get_gemini_summary_model()
 
             if not api_key:
                 logger.error("API Key not found in config.ini. Gemini live mode will not function.")
@@ -80,9 +458,21 @@ class GeminiCommunicator:
 
             logger.info(f"Gemini configured with API key (type: {'placeholder' if 'YOUR_API_KEY' in api_key else 'provided'}). Attempting to load model: {self.model_name}")
             
+            genai = _genai()
             genai.configure(api_key=api_key)
-            self.model = genai.GenerativeModel(self.model_name)
+            try:
+                # The SOP never changes, so it goes in the system instruction: every next-step prompt
+                # then shares an identical prefix that Gemini's implicit context caching can reuse.
+                self.model = genai.GenerativeModel(self.model_name, system_instruction=CURSOR_SOP_PROMPT_TEXT)
+                self.sop_in_system_instruction = True
+            except TypeError: # Older google-generativeai releases have no system_instruction
+                logger.warning("GenerativeModel does not accept system_instruction; SOP will be sent inline with each prompt.")
+                self.model = genai.GenerativeModel(self.model_name)
+            self.summary_model = genai.GenerativeModel(self.summary_model_name)
             logger.info(f"genai.GenerativeModel('{self.model_name}') created instance: {type(self.model)}")
+            if self.summary_model_name != self.model_name:
+                logger.info(f"Summarization will use model '{self.summary_model_name}'.")
+            self._calibrate_chars_per_token()
             
             # Test with a very small generation to check if model is truly live (optional)
             # try:
@@ -100,6 +490,111 @@ class GeminiCommunicator:
         except Exception as e:
             logger.error(f"Error during GeminiCommunicator initialization: {e}", exc_info=True)
             self.model = None # Ensure model is None on any error
+            self.summary_model = None
+
+    def _calibrate_chars_per_token(self):
+        """
+        Measures the model's chars-per-token ratio with a single `count_tokens` call on the SOP
+        (real prompt text, code and prose mixed), so later estimates stay local and free.
+        The measurement is shared per model name, so extra communicators skip the round trip.
+        """
+        try:
+            self.chars_per_token = _measured_chars_per_token(self.model_name)
+            logger.info(f"GeminiComms: Calibrated token estimate at {self.chars_per_token:.2f} chars/token.")
+        except Exception as e:
+            logger.warning(f"GeminiComms: count_tokens calibration failed, using {self.DEFAULT_CHARS_PER_TOKEN} chars/token: {e}")
+
+    def _estimate_tokens(self, text: str) -> int:
+        return int(len(text) / self.chars_per_token)
+
+    def _run_coroutine(self, coroutine):
+        """
+        Runs `coroutine` on this communicator's long-lived event loop and blocks for the result.
+
+        The SDK's async gRPC channel is bound to the loop it was first used on, so all async calls
+        share one background loop (and thus one channel) instead of a fresh `asyncio.run` loop each.
+        Calls run concurrently on that loop; one that outlives `CALL_TIMEOUT_SECONDS` is cancelled
+        and `FutureTimeoutError` is raised so it cannot block the caller forever.
+        """
+        with self._event_loop_lock:
+            if self._event_loop is None:
+                self._event_loop = asyncio.new_event_loop()
+                threading.Thread(target=self._event_loop.run_forever, daemon=True, name="GeminiEventLoop").start()
+        call_future = asyncio.run_coroutine_threadsafe(coroutine, self._event_loop)
+        try:
+            return call_future.result(timeout=self.CALL_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            call_future.cancel()
+            raise
+
+    def _select_history_window(self, full_conversation_history: List[Turn], max_history_turns: int,
+                               token_budget: Optional[int] = None) -> List[Turn]:
+        """
+        Returns the newest turns that fit both `max_history_turns` and the token budget
+        (`token_budget` if given, else `self.history_token_budget`), in one newest-to-oldest pass.
+
+        Tokens are estimated locally (`_estimate_tokens`) rather than with `count_tokens`, which would cost an
+        extra API round trip per turn. The newest turn is always kept, even if it alone exceeds the budget.
+        """
+        candidates = full_conversation_history[max(0, len(full_conversation_history) - max_history_turns):]
+        if token_budget is None:
+            if self.history_token_budget <= 0:
+                return candidates # Budget disabled in config
+            token_budget = self.history_token_budget
+
+        used_tokens = 0
+        kept = 0
+        for turn in reversed(candidates):
+            turn_tokens = self._estimate_tokens(turn.message) + 1
+            if kept and used_tokens + turn_tokens > token_budget:
+                break
+            used_tokens += turn_tokens
+            kept += 1
+        return candidates[len(candidates) - kept:]
+
+    def _prompt_header(self,
+                       project_goal: str,
+                       initial_project_structure_overview: Optional[str],
+                       current_context_summary: Optional[str],
+                       goal_in_cached_context: bool = False) -> str:
+        """
+        Returns the prompt sections that precede the history (SOP fallback, goal, overview, summary).
+
+        These only change when the goal or summary does, so the assembled text is memoized and
+        reused verbatim by every call in between instead of being rebuilt per step. When the SOP
+        and goal already live in an explicit cached context, they are left out.
+        """
+        header_key = (self.sop_in_system_instruction, goal_in_cached_context, project_goal, initial_project_structure_overview, current_context_summary)
+        header = self._prompt_header_cache.get(header_key)
+        if header is not None:
+            return header
+
+        header_buffer = io.StringIO()
+        write = header_buffer.write
+        if not goal_in_cached_context:
+            if not self.sop_in_system_instruction:
+                write(CURSOR_SOP_PROMPT_TEXT); write("\n")
+            write(_project_goal_line(project_goal)); write("\n")
+
+        if initial_project_structure_overview:
+            write("\n--- Initial Project Structure Overview ---\n"); write(initial_project_structure_overview); write("\n")
+
+        if current_context_summary:
+            write("\n--- Summary of Earlier Conversation ---\n"); write(current_context_summary); write("\n")
+
+        write("\n--- Recent Conversation History (Oldest to Newest) ---\n")
+        header = header_buffer.getvalue()
+
+        if len(self._prompt_header_cache) >= self.PROMPT_HEADER_CACHE_SIZE:
+            self._prompt_header_cache.clear() # Old goals/summaries are not coming back
+        self._prompt_header_cache[header_key] = header
+        return header
+
+    @staticmethod
+    def _truncate_cursor_log(cursor_log_content: str, max_chars: int) -> str:
+        """Keeps the tail of an oversized Cursor log (errors and final results are usually at the end)."""
+        logger.warning(f"GeminiComms: Cursor log ({len(cursor_log_content)} chars) exceeds the context budget; keeping the last {max_chars} chars.")
+        return _CURSOR_LOG_TRUNCATION_NOTE + (cursor_log_content[-max_chars:] if max_chars > 0 else "")
 
     def _construct_prompt(self,
                          project_goal: str,
@@ -107,207 +602,375 @@ class GeminiCommunicator:
                          current_context_summary: Optional[str],
                          max_history_turns: int,
                          initial_project_structure_overview: Optional[str] = None,
-                         cursor_log_content: Optional[str] = None
+                         cursor_log_content: Optional[str] = None,
+                         goal_in_cached_context: bool = False,
+                         max_context_tokens: Optional[int] = None
                          ) -> str:
         
-        prompt_parts = [CURSOR_SOP_PROMPT_TEXT]
-        prompt_parts.append(f"User's Overall Project Goal: {project_goal}")
+        # Ordered from most to least stable (goal/overview -> summary -> history -> latest Cursor log)
+        # so consecutive prompts share as long a prefix as possible.
+        # Every section is written followed by a newline into one buffer; the footer closes it.
+        prompt_buffer = io.StringIO()
+        write = prompt_buffer.write
+        header = self._prompt_header(project_goal, initial_project_structure_overview, current_context_summary, goal_in_cached_context)
+        write(header)
 
-        if initial_project_structure_overview:
-            prompt_parts.append(f"\n--- Initial Project Structure Overview ---\n{initial_project_structure_overview}")
-
-        if current_context_summary:
-            prompt_parts.append(f"\n--- Summary of Earlier Conversation ---\n{current_context_summary}")
+        # Fit everything into max_context_tokens up front, so the prompt is built exactly once:
+        # the fixed parts are sized first, then the Cursor log, then history gets what is left.
+        history_token_budget = None
+        if max_context_tokens:
+            available_tokens = int(max_context_tokens * self.CONTEXT_FILL_RATIO) - self._estimate_tokens(header + _NEXT_STEP_PROMPT_FOOTER)
+            if cursor_log_content and self._estimate_tokens(cursor_log_content) > available_tokens:
+                cursor_log_content = self._truncate_cursor_log(cursor_log_content, int(max(available_tokens, 0) * self.chars_per_token))
+            available_tokens -= self._estimate_tokens(cursor_log_content or "")
+            history_token_budget = available_tokens if self.history_token_budget <= 0 else min(self.history_token_budget, available_tokens)
 
-        prompt_parts.append("\n--- Recent Conversation History (Oldest to Newest) ---")
-        
-        # Manage history length
-        start_index = max(0, len(full_conversation_history) - max_history_turns)
-        for turn in full_conversation_history[start_index:]:
-            sender_map = {
-                "user": "User",
-                "assistant": "Your Previous Instruction/Response",
-                "GEMINI_MANAGER": "Your Previous Instruction/Response", # Treat as assistant's turn
-                "cursor_log": "Cursor Tool Output",
-                "system": "System Message"
-            }
-            # Basic turn formatting
-            turn_text = f"{sender_map.get(turn.sender, turn.sender.capitalize())}: {turn.message}"
-            
+        # Manage history length (turn count and token budget)
+        history_window = self._select_history_window(full_conversation_history, max_history_turns, history_token_budget)
+        omitted_turns = len(full_conversation_history) - len(history_window)
+        if omitted_turns:
+            write(f"System Status: {omitted_turns} earlier turn(s) omitted to fit the context budget; rely on the summary for them.\n")
+        sender_labels_get = _HISTORY_SENDER_LABELS.get
+        match_marker = _RESPONSE_MARKER_RE.match
+        for turn in history_window:
+            sender, message = turn.sender, turn.message
             # Check for explicit markers in assistant's past messages to provide clarity
-            if turn.sender == "assistant" or turn.sender == "GEMINI_MANAGER":
-                if turn.message.startswith(GEMINI_MARKER_NEED_INPUT):
-                    turn_text = f"Your Previous Question to User: {turn.message.replace(GEMINI_MARKER_NEED_INPUT, '').strip()}"
-                elif turn.message.startswith(GEMINI_MARKER_TASK_COMPLETE):
-                     turn_text = f"Your Previous Task Completion Statement: {turn.message.replace(GEMINI_MARKER_TASK_COMPLETE, '').strip()}"
-                # Add other markers if needed
+            if sender in _ASSISTANT_SENDERS:
+                marker_match = match_marker(message)
+                marker_label = _PREVIOUS_MARKER_LABELS.get(marker_match.lastgroup) if marker_match else None
+                if marker_label:
+                    write(marker_label); write(message[marker_match.end():].strip()); write("\n")
+                    continue
 
-            prompt_parts.append(turn_text)
+            # Basic turn formatting
+            write(sender_labels_get(sender) or sender.capitalize()); write(": "); write(message); write("\n")
 
         if cursor_log_content is not None: # Could be empty string if file was empty
-            prompt_parts.append(f"\n--- Output from Last Cursor Tool Execution ---\n{cursor_log_content if cursor_log_content else '[No output from Cursor tool]'}")
-        
-        prompt_parts.append("\n--- Your Next Step ---")
-        prompt_parts.append("Based on all the above, provide your next instruction OR use one of the special markers (NEED_USER_INPUT:, TASK_COMPLETE, SYSTEM_ERROR:).")
-        
-        return "\n".join(prompt_parts)
+            write("\n--- Output from Last Cursor Tool Execution ---\n"); write(cursor_log_content if cursor_log_content else '[No output from Cursor tool]'); write("\n")
 
-    def get_next_step_from_gemini(self,
+        write(_NEXT_STEP_PROMPT_FOOTER)
+        return prompt_buffer.getvalue()
+
+    def _prepare_next_step_prompt(self,
                                   project_goal: str,
                                   full_conversation_history: List[Turn],
                                   current_context_summary: Optional[str],
                                   max_history_turns: int,
-                                  max_context_tokens: int, # For Gemini's generate_content config
+                                  max_context_tokens: int,
                                   cursor_log_content: Optional[str],
-                                  initial_project_structure_overview: Optional[str] = None
-                                  ) -> Dict[str, Any]:
-        if not self.model:
-            logger.error("Gemini model not initialized. Cannot get next step.")
-            # Simulate a SYSTEM_ERROR response that the engine can understand
-            return {
-                "status": "ERROR", # Internal status for engine
-                "next_step_action": "SYSTEM_ERROR", # To guide engine's state machine
-                "content": f"{GEMINI_MARKER_SYSTEM_ERROR} Gemini model not initialized. API key might be missing or invalid.",
-                "full_response_for_history": f"{GEMINI_MARKER_SYSTEM_ERROR} Gemini model not initialized. API key might be missing or invalid."
-            }
-
+                                  initial_project_structure_overview: Optional[str] = None,
+                                  goal_in_cached_context: bool = False
+                                  ) -> str:
         prompt = self._construct_prompt(
             project_goal,
             full_conversation_history,
             current_context_summary,
             max_history_turns,
             initial_project_structure_overview,
-            cursor_log_content
+            cursor_log_content,
+            goal_in_cached_context,
+            max_context_tokens
         )
         
-        # Estimate prompt tokens (very rough, for logging only)
-        # A more accurate token counter would be better if hitting limits.
-        estimated_tokens = len(prompt) // 4 
+        # Estimate prompt tokens with the calibrated chars-per-token ratio (no API round trip)
+        estimated_tokens = self._estimate_tokens(prompt)
         logger.info(f"--- FINAL PROMPT TO LIVE GEMINI ({self.model_name}) Est. Tokens: {estimated_tokens} ---")
         # For debugging, can log parts of the prompt:
         # logger.debug(f"Prompt (first 500 chars): {prompt[:500]}")
         # logger.debug(f"Prompt (last 300 chars): {prompt[-300:]}")
         if estimated_tokens > max_context_tokens * 0.9: # Warn if close to limit
              logger.warning(f"Estimated prompt tokens ({estimated_tokens}) are close to or exceed max_context_tokens ({max_context_tokens}).")
+        return prompt
 
+    def _next_step_call_options(self) -> Dict[str, Any]:
+        return {"generation_config": _next_step_generation_config(self.max_output_tokens), "safety_settings": _SAFETY_SETTINGS}
 
-        generation_config = genai.types.GenerationConfig(
-            # max_output_tokens=self.config.get_max_output_tokens_gemini(), # Use config
-            # temperature=self.config.get_temperature_gemini(),             # Use config
-            # Add other relevant generation parameters from config if needed
-        )
-        # Ensure safety settings are reasonable if not using defaults
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
+    def _retry_backoff_seconds(self, attempt: int) -> float:
+        """Full-jitter exponential backoff: uniform in [min, min(max, min * 2**attempt)]."""
+        ceiling = min(self.RETRY_BACKOFF_MAX_SECONDS, self.RETRY_BACKOFF_MIN_SECONDS * (2 ** attempt))
+        return random.uniform(self.RETRY_BACKOFF_MIN_SECONDS, ceiling)
+
+    def _note_rate_limit_error(self, error: Exception):
+        if isinstance(error, _api_exceptions().ResourceExhausted): # HTTP 429
+            retry_delay = _retry_delay_from_error(error, self.RATE_LIMIT_DEFAULT_BACKOFF_SECONDS)
+            logger.warning(f"GeminiComms: Quota exceeded; pausing new Gemini calls for {retry_delay:.0f}s.")
+            self.rate_limiter.penalize(retry_delay)
 
+    def _model_not_initialized_response(self) -> Dict[str, Any]:
+        logger.error("Gemini model not initialized. Cannot get next step.")
+        # Simulate a SYSTEM_ERROR response that the engine can understand
+        return _system_error_response("Gemini model not initialized. API key might be missing or invalid.")
+
+    def _blocked_prompt_response(self, response) -> Optional[Dict[str, Any]]:
+        # response.text might raise ValueError if blocked, or prompt_feedback indicates block
+        if response.prompt_feedback and response.prompt_feedback.block_reason:
+            block_reason = response.prompt_feedback.block_reason
+            block_message = f"Gemini content generation blocked. Reason: {block_reason}."
+            if response.prompt_feedback.safety_ratings:
+                block_message += f" Safety Ratings: {response.prompt_feedback.safety_ratings}"
+            logger.error(block_message)
+            return _system_error_response(block_message)
+        return None
+
+    async def _read_streamed_text(self, response) -> str:
+        """
+        Accumulates a streamed response. The engine only branches on the leading marker, so when the
+        first line is TASK_COMPLETE the text buffered so far is returned as soon as the completion
+        message line is complete as well, and the rest of the stream is closed instead of waited for.
+
+        Closing the SDK's iterator does not stop the underlying streaming RPC, so on that early exit
+        the call is cancelled too where the transport exposes `cancel()` (the gRPC transport does).
+        Otherwise the server may keep generating, and billing output, until it finishes.
+        """
+        chunks = []
+        first_line_pending = True # Cleared once the first non-blank line is complete and checked
+        awaiting_completion_message = False
+        completion_message_started = False
+        stream = response.__aiter__()
         try:
-            logger.info(f"GeminiComms: Calling live Gemini API (model: {self.model_name}). Est. Prompt Tokens: {estimated_tokens}")
-            response = self.model.generate_content(
-                prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
-            
-            # response.text might raise ValueError if blocked, or prompt_feedback indicates block
-            if response.prompt_feedback and response.prompt_feedback.block_reason:
-                block_reason = response.prompt_feedback.block_reason
-                block_message = f"Gemini content generation blocked. Reason: {block_reason}."
-                if response.prompt_feedback.safety_ratings:
-                    block_message += f" Safety Ratings: {response.prompt_feedback.safety_ratings}"
-                logger.error(block_message)
-                return {
-                    "status": "ERROR", 
-                    "next_step_action": "SYSTEM_ERROR",
-                    "content": f"{GEMINI_MARKER_SYSTEM_ERROR} {block_message}",
-                    "full_response_for_history": f"{GEMINI_MARKER_SYSTEM_ERROR} {block_message}"
-                }
-
-            raw_response_text = response.text.strip()
-            logger.info(f"GeminiComms: Raw response from Gemini (first 300 chars): {raw_response_text[:300]}")
-
-            # Parse the response based on markers
-            if raw_response_text.startswith(GEMINI_MARKER_NEED_INPUT):
-                question = raw_response_text.replace(GEMINI_MARKER_NEED_INPUT, "", 1).strip()
-                return {
-                    "status": "OK", # Internal status for engine
-                    "next_step_action": "REQUEST_USER_INPUT",
-                    "clarification_question": question,
-                    "full_response_for_history": raw_response_text 
-                }
-            elif raw_response_text.startswith(GEMINI_MARKER_TASK_COMPLETE):
-                completion_message = raw_response_text.replace(GEMINI_MARKER_TASK_COMPLETE, "", 1).strip()
-                return {
-                    "status": "OK",
-                    "next_step_action": "TASK_COMPLETE",
-                    "completion_message": completion_message,
-                    "full_response_for_history": raw_response_text
-                }
-            elif raw_response_text.startswith(GEMINI_MARKER_SYSTEM_ERROR):
-                error_detail = raw_response_text.replace(GEMINI_MARKER_SYSTEM_ERROR, "", 1).strip()
-                return {
-                    "status": "ERROR", # Internal status for engine
-                    "next_step_action": "SYSTEM_ERROR", 
-                    "content": raw_response_text, # Keep marker for history
-                    "full_response_for_history": raw_response_text,
-                    "error": error_detail # Specific error for engine's last_error_message
-                }
-            else: # Assume it's an instruction for Cursor
-                return {
-                    "status": "OK",
-                    "next_step_action": "WRITE_TO_FILE",
-                    "instruction": raw_response_text,
-                    "full_response_for_history": raw_response_text
-                }
-
-        except google.api_core.exceptions.GoogleAPIError as e:
-            logger.error(f"GeminiComms: Google API Error: {e}", exc_info=True)
-            error_content = f"{GEMINI_MARKER_SYSTEM_ERROR} Google API Error: {type(e).__name__} - {e}"
-            return {
-                "status": "ERROR", 
-                "next_step_action": "SYSTEM_ERROR",
-                "content": error_content, 
-                "full_response_for_history": error_content,
-                "error": f"Google API Error: {type(e).__name__} - {e}"
+            async for chunk in stream:
+                chunk_text = _candidate_text(chunk)
+                chunks.append(chunk_text)
+                if awaiting_completion_message:
+                    *completed_lines, partial_line = chunk_text.split("\n")
+                    if completed_lines and (completion_message_started or any(line.strip() for line in completed_lines)):
+                        logger.info("GeminiComms: TASK_COMPLETE message received; not waiting for the rest of the stream.")
+                        _cancel_streaming_call(response)
+                        return "".join(chunks)
+                    completion_message_started = completion_message_started or bool(partial_line.strip())
+                    continue
+                if not first_line_pending or "\n" not in chunk_text:
+                    continue
+                buffered_text = "".join(chunks).lstrip()
+                if "\n" not in buffered_text:
+                    continue # Only leading blank lines so far
+                first_line_pending = False
+                first_line, rest = buffered_text.split("\n", 1)
+                if not first_line.startswith(GEMINI_MARKER_TASK_COMPLETE):
+                    continue
+                if first_line[len(GEMINI_MARKER_TASK_COMPLETE):].strip() or "\n" in rest.lstrip():
+                    logger.info("GeminiComms: TASK_COMPLETE message received; not waiting for the rest of the stream.")
+                    _cancel_streaming_call(response)
+                    return buffered_text
+                awaiting_completion_message = True # Marker alone on its line; the message follows
+                completion_message_started = bool(rest.strip())
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            _log_token_usage(response)
+        streamed_text = "".join(chunks)
+        if not streamed_text:
+            # Mirrors what `response.text` raises for an empty/blocked candidate; handled as blocked content
+            raise ValueError("Gemini returned no text (the response may have been blocked).")
+        return streamed_text
+
+    def _parse_next_step_text(self, raw_response_text: str, cache_key: str) -> Dict[str, Any]:
+        logger.info(f"GeminiComms: Raw response from Gemini (first 300 chars): {raw_response_text[:300]}")
+
+        # Parse the response based on markers
+        marker_match = _RESPONSE_MARKER_RE.match(raw_response_text)
+        marker = marker_match.lastgroup if marker_match else None
+        if marker == "need_input":
+            question = raw_response_text[marker_match.end():].strip()
+            result = {
+                "status": "OK", # Internal status for engine
+                "next_step_action": "REQUEST_USER_INPUT",
+                "clarification_question": question,
+                "full_response_for_history": raw_response_text 
+            }
+        elif marker == "task_complete":
+            completion_message = raw_response_text[marker_match.end():].strip()
+            result = {
+                "status": "OK",
+                "next_step_action": "TASK_COMPLETE",
+                "completion_message": completion_message,
+                "full_response_for_history": raw_response_text
+            }
+        elif marker == "system_error":
+            error_detail = raw_response_text[marker_match.end():].strip()
+            result = {
+                "status": "ERROR", # Internal status for engine
+                "next_step_action": "SYSTEM_ERROR", 
+                "content": raw_response_text, # Keep marker for history
+                "full_response_for_history": raw_response_text,
+                "error": error_detail # Specific error for engine's last_error_message
             }
-        except ValueError as ve: # Can be raised by response.text if content is blocked
-            logger.error(f"GeminiComms: ValueError processing Gemini response (likely content blocked): {ve}", exc_info=True)
-            error_content = f"{GEMINI_MARKER_SYSTEM_ERROR} Error processing Gemini response (ValueError, possibly blocked content): {ve}"
+        else: # Assume it's an instruction for Cursor
+            result = {
+                "status": "OK",
+                "next_step_action": "WRITE_TO_FILE",
+                "instruction": raw_response_text,
+                "full_response_for_history": raw_response_text
+            }
+
+        if result["status"] == "OK": # Never cache errors; they should be retried live
+            self.response_cache.set(cache_key, result)
+        return result
+
+    def _next_step_error_response(self, error: Exception, response=None) -> Dict[str, Any]:
+        if isinstance(error, _api_exceptions().GoogleAPIError):
+            # Expected failure (quota, auth, bad request): the SDK traceback adds nothing to the message
+            logger.error(f"GeminiComms: Google API Error: {type(error).__name__} - {error}")
+            error_message = f"Google API Error: {type(error).__name__} - {error}"
+            return _system_error_response(error_message, error=error_message)
+        if isinstance(error, ValueError): # Can be raised by response.text if content is blocked
+            logger.error(f"GeminiComms: ValueError processing Gemini response (likely content blocked): {error}")
             # Try to get block reason if available
             block_reason_detail = "Unknown blocking reason."
-            if hasattr(response, 'prompt_feedback') and response.prompt_feedback and response.prompt_feedback.block_reason:
+            if response is not None and response.prompt_feedback and response.prompt_feedback.block_reason:
                 block_reason_detail = f"Reason: {response.prompt_feedback.block_reason}."
                 if response.prompt_feedback.safety_ratings:
                     block_reason_detail += f" Safety Ratings: {response.prompt_feedback.safety_ratings}"
-            error_content = f"{GEMINI_MARKER_SYSTEM_ERROR} Content blocked by Gemini. {block_reason_detail}"
-
-            return {
-                "status": "ERROR", 
-                "next_step_action": "SYSTEM_ERROR",
-                "content": error_content, 
-                "full_response_for_history": error_content,
-                "error": f"Content blocked by Gemini. {block_reason_detail}"
-            }
+            error_message = f"Content blocked by Gemini. {block_reason_detail}"
+            return _system_error_response(error_message, error=error_message)
+        logger.error(f"GeminiComms: Unexpected error in get_next_step_from_gemini: {error}", exc_info=error)
+        error_message = f"Unexpected error: {type(error).__name__} - {error}"
+        return _system_error_response(error_message, error=error_message)
+
+    def _create_goal_cached_model(self, project_goal: str):
+        genai = _genai()
+        cached_content = genai.caching.CachedContent.create(
+            model=self.model_name,
+            system_instruction=CURSOR_SOP_PROMPT_TEXT,
+            contents=[_project_goal_line(project_goal)],
+            ttl=datetime.timedelta(minutes=self.explicit_prompt_cache_ttl_minutes),
+        )
+        logger.info(f"GeminiComms: Created explicit prompt cache '{cached_content.name}' for the current project goal.")
+        return genai.GenerativeModel.from_cached_content(cached_content=cached_content), cached_content
+
+    @staticmethod
+    def _delete_cached_content(cached_content):
+        """Best-effort delete of a server-side CachedContent that is no longer referenced (it would otherwise live until its TTL)."""
+        try:
+            cached_content.delete()
+            logger.info(f"GeminiComms: Deleted explicit prompt cache '{cached_content.name}'.")
         except Exception as e:
-            logger.error(f"GeminiComms: Unexpected error in get_next_step_from_gemini: {e}", exc_info=True)
-            error_content = f"{GEMINI_MARKER_SYSTEM_ERROR} Unexpected error: {type(e).__name__} - {e}"
-            return {
-                "status": "ERROR", 
-                "next_step_action": "SYSTEM_ERROR",
-                "content": error_content, 
-                "full_response_for_history": error_content,
-                "error": f"Unexpected error: {type(e).__name__} - {e}"
-            }
+            logger.warning(f"GeminiComms: Could not delete explicit prompt cache '{getattr(cached_content, 'name', '?')}': {e}")
+
+    async def _model_for_goal(self, project_goal: str) -> Tuple[Any, bool]:
+        """
+        Returns the model to use for `project_goal` and whether the SOP and goal are already in its
+        explicit cached context (so the prompt can omit them). Without explicit caching enabled,
+        or if the cache cannot be created, this is `self.model` with the full prompt.
+        """
+        if not self.explicit_prompt_cache_enabled:
+            return self.model, False
+
+        cached_entry = self._goal_cached_models.pop(project_goal, None)
+        if cached_entry and time.monotonic() < cached_entry[1]:
+            self._goal_cached_models[project_goal] = cached_entry # Re-insert as most recently used
+            return cached_entry[0], True
+
+        try:
+            goal_model, cached_content = await asyncio.to_thread(self._create_goal_cached_model, project_goal)
+        except Exception as e:
+            # Typically the prefix is below the model's minimum cacheable size or the model isn't cacheable
+            logger.warning(f"GeminiComms: Explicit prompt caching unavailable ({type(e).__name__}: {e}). Using implicit caching only.")
+            self.explicit_prompt_cache_enabled = False
+            return self.model, False
+
+        refresh_at = time.monotonic() + max(60.0, self.explicit_prompt_cache_ttl_minutes * 60.0 - 60.0) # Refresh before server-side expiry
+        stale_contents = [] # An expiring entry for this goal is left to its server-side TTL, which is under a minute away
+        while len(self._goal_cached_models) >= self.GOAL_CACHED_MODELS_SIZE:
+            oldest_goal = next(iter(self._goal_cached_models)) # Dicts keep insertion order
+            stale_contents.append(self._goal_cached_models.pop(oldest_goal)[2])
+        self._goal_cached_models[project_goal] = (goal_model, refresh_at, cached_content)
+        for stale_content in stale_contents:
+            await asyncio.to_thread(self._delete_cached_content, stale_content)
+        return goal_model, True
+
+    async def get_next_step_from_gemini_async(self,
+                                              project_goal: str,
+                                              full_conversation_history: List[Turn],
+                                              current_context_summary: Optional[str],
+                                              max_history_turns: int,
+                                              max_context_tokens: int, # For Gemini's generate_content config
+                                              cursor_log_content: Optional[str],
+                                              initial_project_structure_overview: Optional[str] = None
+                                              ) -> Dict[str, Any]:
+        """Awaitable next-step call built on `generate_content_async`; the event loop stays free while Gemini generates."""
+        if not self.model:
+            return self._model_not_initialized_response()
+
+        model, goal_in_cached_context = await self._model_for_goal(project_goal)
+        prompt = self._prepare_next_step_prompt(
+            project_goal, full_conversation_history, current_context_summary, max_history_turns,
+            max_context_tokens, cursor_log_content, initial_project_structure_overview,
+            goal_in_cached_context
+        )
+        cache_key = self.response_cache.make_key(self.model_name, project_goal, prompt)
+        cached_response = self.response_cache.get(cache_key)
+        if cached_response is not None:
+            logger.info(f"GeminiComms: Response cache hit (key {cache_key[:12]}, hit rate {self.response_cache.hit_rate:.0%}). Skipping live Gemini call.")
+            return cached_response
+
+        response = None
+        started_at = time.monotonic()
+        for attempt in range(1, self.MAX_CALL_ATTEMPTS + 1):
+            try:
+                await self.rate_limiter.acquire(self._estimate_tokens(prompt))
+                logger.info(f"GeminiComms: Calling live Gemini API (model: {self.model_name}, attempt {attempt}).")
+                response = await model.generate_content_async(prompt, stream=True, **self._next_step_call_options())
+                blocked_response = self._blocked_prompt_response(response)
+                if blocked_response:
+                    return blocked_response
+                raw_response_text = (await self._read_streamed_text(response)).strip()
+                return self._parse_next_step_text(raw_response_text, cache_key)
+            except _retryable_api_errors() as e:
+                self._note_rate_limit_error(e)
+                retry_wait = max(self._retry_backoff_seconds(attempt), _retry_delay_from_error(e, 0.0))
+                if attempt == self.MAX_CALL_ATTEMPTS or time.monotonic() - started_at + retry_wait > self.RETRY_BUDGET_SECONDS:
+                    return self._next_step_error_response(e, response)
+                logger.warning(f"GeminiComms: Transient {type(e).__name__} on attempt {attempt}/{self.MAX_CALL_ATTEMPTS}; retrying in {retry_wait:.1f}s.")
+                await asyncio.sleep(retry_wait)
+            except Exception as e:
+                if goal_in_cached_context:
+                    stale_entry = self._goal_cached_models.pop(project_goal, None) # Recreate the cached context on the next call
+                    if stale_entry:
+                        await asyncio.to_thread(self._delete_cached_content, stale_entry[2])
+                return self._next_step_error_response(e, response)
+
+    def get_next_step_from_gemini(self,
+                                  project_goal: str,
+                                  full_conversation_history: List[Turn],
+                                  current_context_summary: Optional[str],
+                                  max_history_turns: int,
+                                  max_context_tokens: int, # For Gemini's generate_content config
+                                  cursor_log_content: Optional[str],
+                                  initial_project_structure_overview: Optional[str] = None
+                                  ) -> Dict[str, Any]:
+        """Sync shim over `get_next_step_from_gemini_async` for the engine's worker threads."""
+        try:
+            return self._run_coroutine(self.get_next_step_from_gemini_async(
+                project_goal, full_conversation_history, current_context_summary, max_history_turns,
+                max_context_tokens, cursor_log_content, initial_project_structure_overview
+            ))
+        except FutureTimeoutError:
+            error_message = f"Gemini next-step call timed out after {self.CALL_TIMEOUT_SECONDS:.0f}s."
+            logger.error(f"GeminiComms: {error_message}")
+            return _system_error_response(error_message, error=error_message)
 
     def summarize_conversation_history(self,
                                        history_turns: List[Turn],
                                        existing_summary: Optional[str],
                                        project_goal: str,
                                        max_tokens: int) -> Optional[str]:
-        if not self.model:
+        """Sync shim over `summarize_conversation_history_async` for the engine's worker threads."""
+        try:
+            return self._run_coroutine(self.summarize_conversation_history_async(
+                history_turns, existing_summary, project_goal, max_tokens
+            ))
+        except FutureTimeoutError:
+            logger.error(f"Gemini summarization call timed out after {self.CALL_TIMEOUT_SECONDS:.0f}s. Keeping existing summary.")
+            return existing_summary
+
+    async def summarize_conversation_history_async(self,
+                                                   history_turns: List[Turn],
+                                                   existing_summary: Optional[str],
+                                                   project_goal: str,
+                                                   max_tokens: int) -> Optional[str]:
+        if not self.summary_model:
             logger.error("Gemini model not initialized. Cannot summarize text.")
             return existing_summary # Return old summary if model is not working
 
@@ -315,49 +978,59 @@ class GeminiCommunicator:
             logger.info("No new turns to summarize. Returning existing summary.")
             return existing_summary
 
-        prompt_parts = ["You are a helpful AI assistant tasked with summarizing a conversation."]
-        prompt_parts.append(f"The overall project goal is: {project_goal}")
+        # Same single-buffer assembly as _construct_prompt: each section is followed by a newline
+        prompt_buffer = io.StringIO()
+        write = prompt_buffer.write
+        write("You are a helpful AI assistant tasked with summarizing a conversation.\n")
+        write("The overall project goal is: "); write(project_goal); write("\n")
         if existing_summary:
-            prompt_parts.append(f"\nHere is the existing summary of the conversation so far:\n{existing_summary}")
-            prompt_parts.append("\nNow, please incorporate the following new conversation turns into this summary. Create a concise, updated summary that reflects the key information and decisions from both the old summary and the new turns.")
+            write("\nHere is the existing summary of the conversation so far:\n"); write(existing_summary); write("\n")
+            write("\nNow, please incorporate the following new conversation turns into this summary. Create a concise, updated summary that reflects the key information and decisions from both the old summary and the new turns.\n")
         else:
-            prompt_parts.append("\nPlease provide a concise summary of the following conversation:")
+            write("\nPlease provide a concise summary of the following conversation:\n")
         
-        prompt_parts.append("\n--- New Conversation Turns ---")
+        write("\n--- New Conversation Turns ---\n")
         for turn in history_turns:
-            prompt_parts.append(f"[{turn.sender}]: {turn.message}")
+            write("["); write(turn.sender); write("]: "); write(turn.message); write("\n")
         
-        prompt_parts.append("\n--- End of New Conversation Turns ---")
-        prompt_parts.append(f"Please provide the new, comprehensive summary (max {max_tokens} tokens).")
+        write("\n--- End of New Conversation Turns ---\n")
+        write(f"Please provide the new, comprehensive summary (max {max_tokens} tokens).")
         
-        summarization_prompt = "\n".join(prompt_parts)
+        summarization_prompt = prompt_buffer.getvalue()
         # logger.debug(f"Summarization prompt for Gemini: {summarization_prompt}")
+        summary_cache_key = GeminiResponseCache.make_key(self.summary_model_name, summarization_prompt)
+        cached_summary = self.summary_cache.get(summary_cache_key)
+        if cached_summary is not None:
+            logger.info(f"Summary cache hit (key {summary_cache_key[:12]}). Skipping Gemini summarization call.")
+            return cached_summary
 
-        generation_config = genai.types.GenerationConfig(
-            max_output_tokens=max_tokens,
-            # temperature=0.5 # Slightly lower temperature for factual summarization
-        )
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
-        ]
 
         try:
-            logger.info(f"Calling Gemini for summarization (model: {self.model_name}).")
-            response = self.model.generate_content(
+            await self.rate_limiter.acquire(self._estimate_tokens(summarization_prompt))
+            logger.info(f"Calling Gemini for summarization (model: {self.summary_model_name}).")
+            response = await self.summary_model.generate_content_async(
                 summarization_prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
+                generation_config=_summary_generation_config(max_tokens),
+                safety_settings=_SAFETY_SETTINGS
             )
             if response.prompt_feedback and response.prompt_feedback.block_reason:
                 logger.error(f"Summarization call blocked by Gemini. Reason: {response.prompt_feedback.block_reason}")
                 return existing_summary # Return old summary on block
 
-            new_summary = response.text.strip()
+            new_summary = _candidate_text(response).strip()
+            if not new_summary:
+                logger.error("Summarization call returned no text. Keeping existing summary.")
+                return existing_summary
             logger.info(f"Successfully received summary from Gemini. Length: {len(new_summary)}")
+            _log_token_usage(response)
+            self.summary_cache.set(summary_cache_key, new_summary)
             return new_summary
         except Exception as e:
+            self._note_rate_limit_error(e)
             logger.error(f"Error during Gemini summarization call: {e}", exc_info=True)
-            return existing_summary # Return old summary on error 
\ No newline at end of file
+            return existing_summary # Return old summary on error 
+
+@functools.lru_cache(maxsize=1)
+def get_communicator() -> GeminiCommunicator:
+    """Process-wide GeminiCommunicator, so config parsing, `genai.configure` and the gRPC channel are set up once."""
+    return GeminiCommunicator()
@@ -22,6 +22,8 @@ import time
 import queue
 import traceback
 import logging
+import logging.handlers
+import atexit
 import os
 import threading
 from pathlib import Path
@@ -109,8 +111,14 @@ ch.setFormatter(console_formatter)
 if logger.hasHandlers():
     logger.handlers.clear()
 
-logger.addHandler(fh)
-logger.addHandler(ch)
+# File and console writes happen on the listener thread, so callers (engine worker, Gemini
+# background loop) only enqueue records and never block on disk/stdout flushes.
+log_queue = queue.Queue(-1)
+log_listener = logging.handlers.QueueListener(log_queue, fh, ch, respect_handler_level=True)
+log_listener.start()
+atexit.register(log_listener.stop) # Flushes queued records before the process exits
+
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
 
 # Test logging setup
 logger.debug("Logging debug test message.")
@@ -1,11 +1,16 @@
 import json
 import os
 import uuid # For generating project IDs
-from typing import List, Optional, Dict, Any 
+from typing import List, Optional, Dict, Any, Tuple
 from models import Project, ProjectState, Turn
-from dataclasses import asdict
+from dataclasses import asdict, fields
 import logging # Added
 
+try:
+    import orjson # C-accelerated JSON, used for the per-turn history file
+except ImportError:
+    orjson = None
+
 # Get logger instance
 logger = logging.getLogger("orchestrator_prime")
 
@@ -13,6 +18,10 @@ APP_DATA_DIR = "app_data"
 PROJECTS_FILE = os.path.join(APP_DATA_DIR, "projects.json")
 PROJECT_STATE_DIR_NAME = ".orchestrator_state"
 PROJECT_STATE_FILE_NAME = "state.json"
+PROJECT_HISTORY_FILE_NAME = "history.jsonl" # Append-only conversation history, one Turn per line
+
+# Parsed projects.json keyed by (path, mtime_ns, size); each load still builds fresh Project objects
+_projects_file_cache: Optional[Tuple[Tuple[str, int, int], List[Dict[str, Any]]]] = None
 
 class PersistenceError(Exception):
     """Custom exception for persistence layer errors."""
@@ -69,9 +78,16 @@ def load_projects() -> List[Project]:
         except IOError as e:
             logger.error(f"Could not create empty projects file {PROJECTS_FILE}: {e}", exc_info=True)
             return []
+    global _projects_file_cache
     try:
-        with open(PROJECTS_FILE, 'r') as f:
-            projects_data = json.load(f)
+        file_stat = os.stat(PROJECTS_FILE)
+        cache_key = (os.path.abspath(PROJECTS_FILE), file_stat.st_mtime_ns, file_stat.st_size)
+        if _projects_file_cache is not None and _projects_file_cache[0] == cache_key:
+            projects_data = _projects_file_cache[1] # Unchanged since last read; skip re-parsing
+        else:
+            with open(PROJECTS_FILE, 'r') as f:
+                projects_data = json.load(f)
+            _projects_file_cache = (cache_key, projects_data)
         # Add validation here if needed (e.g., check if data is a list of dicts)
         return [Project(**data) for data in projects_data]
     except json.JSONDecodeError as e:
@@ -94,7 +110,9 @@ def save_projects(projects: List[Project]):
         logger.critical(f"Cannot save projects, app_data directory inaccessible: {e}")
         raise PersistenceError(f"Cannot save projects, app_data directory inaccessible: {e}") from e
 
+    global _projects_file_cache
     projects_data = [asdict(p) for p in projects]
+    _projects_file_cache = None # A same-size rewrite within the mtime granularity must not hit the cache
     try:
         with open(PROJECTS_FILE, 'w') as f:
             json.dump(projects_data, f, indent=4)
@@ -125,15 +143,24 @@ def load_project_state(project: Project) -> Optional[ProjectState]:
         with open(state_file_path, 'r') as f:
             state_data = json.load(f)
         
-        # Rehydrate Turn objects from dicts
-        if 'conversation_history' in state_data and isinstance(state_data['conversation_history'], list):
+        history_file_path = os.path.join(state_dir, PROJECT_HISTORY_FILE_NAME)
+        legacy_history = state_data.pop('conversation_history', None)
+        if os.path.exists(history_file_path):
+            state_data['conversation_history'] = _load_conversation_history(history_file_path, project.name)
+        elif isinstance(legacy_history, list):
+            # Older state files embed the full history; rehydrate it and migrate to the JSONL file
             hydrated_history = []
-            for turn_data in state_data['conversation_history']:
+            for turn_data in legacy_history:
                 if isinstance(turn_data, dict):
                     hydrated_history.append(Turn(**turn_data))
                 else:
                     logger.warning(f"Skipping invalid item in conversation_history for project '{project.name}': {turn_data}")
             state_data['conversation_history'] = hydrated_history
+            try:
+                save_conversation_history(project, hydrated_history)
+                logger.info(f"Migrated {len(hydrated_history)} history turns for '{project.name}' to {history_file_path}")
+            except PersistenceError as e_migrate:
+                logger.warning(f"Could not migrate conversation history for '{project.name}' to JSONL: {e_migrate}")
         else:
             state_data['conversation_history'] = [] # Ensure it exists as a list
             
@@ -180,8 +207,13 @@ def save_project_state(project: Project, state: ProjectState):
     state_file_path = os.path.join(state_dir, PROJECT_STATE_FILE_NAME)
     logger.debug(f"Attempting to save project state for '{project.name}' to {state_file_path}")
     try:
-        # Convert state (including Turn objects) to dict for JSON serialization
-        state_data = asdict(state)
+        # Conversation history lives in the append-only history file (see append_turn),
+        # so only the remaining state fields are written here. Until that file exists (e.g. a
+        # legacy migration failed) the history stays embedded so it is not lost.
+        history_file_exists = os.path.exists(os.path.join(state_dir, PROJECT_HISTORY_FILE_NAME))
+        state_data = {f.name: getattr(state, f.name) for f in fields(state) if f.name != 'conversation_history'}
+        if not history_file_exists:
+            state_data['conversation_history'] = [asdict(turn) for turn in state.conversation_history]
         with open(state_file_path, 'w') as f:
             json.dump(state_data, f, indent=4)
         logger.info(f"Successfully saved project state for '{project.name}' (Status: {state.current_status})")
@@ -192,6 +224,69 @@ def save_project_state(project: Project, state: ProjectState):
         logger.critical(f"Unexpected error saving project state for '{project.name}' to {state_file_path}: {e}", exc_info=True)
         raise PersistenceError(f"Unexpected error saving project state for {project.name}: {e}") from e
 
+def _get_history_file_path(project: Project) -> str:
+    if not project or not project.workspace_root_path:
+        logger.error("Invalid project provided (missing or no workspace_root_path) for conversation history.")
+        raise PersistenceError("Invalid project for conversation history.")
+
+    abs_workspace_path = os.path.abspath(project.workspace_root_path)
+    state_dir = _ensure_project_state_dir_exists(abs_workspace_path)
+    if not state_dir:
+        raise PersistenceError(f"Failed to create/access state directory for {project.name}")
+    return os.path.join(state_dir, PROJECT_HISTORY_FILE_NAME)
+
+def _serialize_turn(turn: Turn) -> bytes:
+    """Serializes a Turn to a single JSON line (without the trailing newline)."""
+    if orjson is not None:
+        return orjson.dumps(turn) # orjson serializes dataclasses natively
+    return json.dumps(asdict(turn)).encode('utf-8')
+
+def _deserialize_turn(line: bytes) -> Turn:
+    turn_data = orjson.loads(line) if orjson is not None else json.loads(line)
+    return Turn(**turn_data)
+
+def _load_conversation_history(history_file_path: str, project_name: str) -> List[Turn]:
+    history: List[Turn] = []
+    with open(history_file_path, 'rb') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                history.append(_deserialize_turn(line))
+            except (ValueError, TypeError) as e: # JSON decode errors (stdlib and orjson) are ValueErrors
+                logger.warning(f"Skipping invalid line {line_number} in {history_file_path} for project '{project_name}': {e}")
+    return history
+
+def append_turn(project: Project, turn: Turn, full_history: Optional[List[Turn]] = None):
+    """
+    Appends a single Turn to the project's history file without rewriting earlier turns.
+
+    If the file does not exist yet and `full_history` is given, the whole history is written
+    instead, so turns held only in memory (or embedded in a legacy state.json) are kept.
+    """
+    history_file_path = _get_history_file_path(project)
+    if full_history is not None and not os.path.exists(history_file_path):
+        save_conversation_history(project, full_history)
+        return
+    try:
+        with open(history_file_path, 'ab') as f:
+            f.write(_serialize_turn(turn) + b"\n")
+    except (IOError, TypeError) as e:
+        logger.error(f"Failed to append turn to {history_file_path} for '{project.name}': {e}", exc_info=True)
+        raise PersistenceError(f"Failed to append conversation turn for {project.name}: {e}") from e
+
+def save_conversation_history(project: Project, turns: List[Turn]):
+    """Rewrites the project's history file with `turns` (used when history is reset or migrated)."""
+    history_file_path = _get_history_file_path(project)
+    try:
+        with open(history_file_path, 'wb') as f:
+            f.write(b"".join(_serialize_turn(turn) + b"\n" for turn in turns))
+        logger.debug(f"Rewrote conversation history for '{project.name}' ({len(turns)} turns)")
+    except (IOError, TypeError) as e:
+        logger.error(f"Failed to write conversation history to {history_file_path} for '{project.name}': {e}", exc_info=True)
+        raise PersistenceError(f"Failed to write conversation history for {project.name}: {e}") from e
+
 def add_project(project_details: Project) -> Optional[Project]: # Modified to take Project object
     if not isinstance(project_details, Project):
         logger.error(f"Invalid input to add_project. Expected Project object, got {type(project_details)}")
@@ -0,0 +1,325 @@
+import asyncio
+import os
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import gemini_comms_real
+from config_manager import get_config_manager
+from gemini_comms_real import GeminiCommunicator, GeminiRateLimiter, GeminiResponseCache, SummaryDiskCache
+from models import Turn
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(gemini_comms_real.time, "monotonic", fake_clock)
+    return fake_clock
+
+
+@pytest.fixture
+def communicator(tmp_path, monkeypatch):
+    """A communicator built from a fresh default config.ini (placeholder API key, so no SDK is loaded)."""
+    monkeypatch.chdir(tmp_path)
+    get_config_manager.cache_clear()
+    yield GeminiCommunicator()
+    get_config_manager.cache_clear()
+
+
+def _turns(*messages: str):
+    return [Turn(sender="user", message=message, timestamp="t") for message in messages]
+
+
+def test_response_cache_disabled_by_default():
+    cache = GeminiResponseCache()
+    cache.set("key", {"status": "INSTRUCTION"})
+
+    assert not cache.enabled
+    assert cache.get("key") is None
+    assert cache.hits == cache.misses == 0
+
+
+def test_response_cache_hit_returns_copy(clock):
+    cache = GeminiResponseCache(ttl_seconds=60)
+    cache.set("key", {"status": "INSTRUCTION", "content": "do it"})
+
+    first = cache.get("key")
+    first["cache_hit"] = True
+
+    assert cache.get("key") == {"status": "INSTRUCTION", "content": "do it"}
+    assert cache.hits == 2
+    assert cache.hit_rate == 1.0
+
+
+def test_response_cache_entry_expires_after_ttl(clock):
+    cache = GeminiResponseCache(ttl_seconds=60)
+    cache.set("key", {"status": "INSTRUCTION"})
+
+    clock.now += 60
+    assert cache.get("key") is not None
+    clock.now += 1
+    assert cache.get("key") is None
+    assert cache.misses == 1
+
+
+def test_response_cache_evicts_least_recently_used(clock):
+    cache = GeminiResponseCache(ttl_seconds=60, max_entries=2)
+    cache.set("a", {"content": "a"})
+    cache.set("b", {"content": "b"})
+    cache.get("a") # "b" becomes the oldest entry
+    cache.set("c", {"content": "c"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"content": "a"}
+    assert cache.get("c") == {"content": "c"}
+
+
+def test_response_cache_key_separates_parts():
+    assert GeminiResponseCache.make_key("ab", "c") != GeminiResponseCache.make_key("a", "bc")
+    assert GeminiResponseCache.make_key("a", "b") == GeminiResponseCache.make_key("a", "b")
+
+
+def test_rate_limiter_with_zero_limits_never_waits(clock):
+    limiter = GeminiRateLimiter(requests_per_minute=0, tokens_per_minute=0)
+
+    assert all(limiter._reserve(10_000) == 0.0 for _ in range(100))
+
+
+def test_rate_limiter_request_bucket_refills_over_time(clock):
+    limiter = GeminiRateLimiter(requests_per_minute=2, tokens_per_minute=0)
+
+    assert limiter._reserve(1) == 0.0
+    assert limiter._reserve(1) == 0.0
+    assert limiter._reserve(1) == pytest.approx(30.0) # One request every 30s at 2 RPM
+    clock.now += 30
+    assert limiter._reserve(1) == pytest.approx(30.0) # The refill paid back the previous deficit
+
+
+def test_rate_limiter_token_bucket_caps_oversize_prompt(clock):
+    limiter = GeminiRateLimiter(requests_per_minute=0, tokens_per_minute=600)
+
+    assert limiter._reserve(5_000) == 0.0 # Charged as the full bucket, not left waiting forever
+    assert limiter._reserve(60) == pytest.approx(6.0)
+
+
+def test_rate_limiter_penalize_blocks_until_deadline(clock):
+    limiter = GeminiRateLimiter(requests_per_minute=0, tokens_per_minute=0)
+    limiter.penalize(10)
+
+    assert limiter._reserve(1) == pytest.approx(10.0)
+    clock.now += 4
+    assert limiter._reserve(1) == pytest.approx(6.0)
+    clock.now += 6
+    assert limiter._reserve(1) == 0.0
+
+
+def test_history_window_respects_max_turns(communicator):
+    history = _turns("a", "b", "c", "d")
+
+    assert [turn.message for turn in communicator._select_history_window(history, 2)] == ["c", "d"]
+    assert communicator._select_history_window(history, 0) == []
+
+
+def test_history_window_keeps_newest_turns_within_budget(communicator):
+    history = _turns("x" * 40, "y" * 40, "z" * 40) # 11 estimated tokens each at 4 chars/token
+
+    assert [turn.message[0] for turn in communicator._select_history_window(history, 10, token_budget=22)] == ["y", "z"]
+    assert [turn.message[0] for turn in communicator._select_history_window(history, 10, token_budget=21)] == ["z"]
+
+
+def test_history_window_always_keeps_newest_turn(communicator):
+    history = _turns("short", "x" * 4000)
+
+    assert [turn.message for turn in communicator._select_history_window(history, 10, token_budget=1)] == ["x" * 4000]
+
+
+def test_history_window_budget_disabled_in_config(communicator):
+    communicator.history_token_budget = 0
+    history = _turns("x" * 4000, "y" * 4000)
+
+    assert communicator._select_history_window(history, 10) == history
+
+
+class FakeStreamingCall:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeStreamedResponse:
+    """Stands in for the SDK's async streamed response: yields one chunk per text piece."""
+    usage_metadata = None
+    prompt_feedback = None
+
+    def __init__(self, *pieces: str):
+        self.pieces = pieces
+        self.chunks_read = 0
+        self.closed = False
+        self._iterator = FakeStreamingCall()
+
+    def __aiter__(self):
+        async def chunks():
+            try:
+                for piece in self.pieces:
+                    self.chunks_read += 1
+                    yield SimpleNamespace(candidates=[SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=piece)]))])
+            finally:
+                self.closed = True
+        return chunks()
+
+
+def test_streamed_text_reads_whole_instruction(communicator):
+    response = FakeStreamedResponse("Create ", "main.py\n", "with a CLI.")
+
+    assert asyncio.run(communicator._read_streamed_text(response)) == "Create main.py\nwith a CLI."
+    assert response.chunks_read == 3
+    assert not response._iterator.cancelled
+
+
+def test_streamed_text_stops_after_task_complete_message(communicator):
+    response = FakeStreamedResponse("TASK_", "COMPLETE\n", "\n", "All ", "done\n", "more text", "even more")
+
+    assert asyncio.run(communicator._read_streamed_text(response)) == "TASK_COMPLETE\n\nAll done\n"
+    assert response.chunks_read == 5
+    assert response.closed
+    assert response._iterator.cancelled
+
+
+def test_streamed_text_stops_on_inline_task_complete_message(communicator):
+    response = FakeStreamedResponse("TASK_COMPLETE All done\n", "more text")
+
+    assert asyncio.run(communicator._read_streamed_text(response)) == "TASK_COMPLETE All done\n"
+    assert response._iterator.cancelled
+
+
+def test_streamed_text_ignores_task_complete_after_first_line(communicator):
+    response = FakeStreamedResponse("Run the tests\n", "TASK_COMPLETE\n", "tail")
+
+    assert asyncio.run(communicator._read_streamed_text(response)) == "Run the tests\nTASK_COMPLETE\ntail"
+    assert not response._iterator.cancelled
+
+
+def test_streamed_text_empty_stream_raises(communicator):
+    response = FakeStreamedResponse()
+
+    with pytest.raises(ValueError):
+        asyncio.run(communicator._read_streamed_text(response))
+    assert response.closed
+
+
+class FlakyModel:
+    """Fails with `error` on the first `failures` calls, then streams `reply`."""
+    def __init__(self, error: Exception, failures: int, reply: str = "Run the tests"):
+        self.error = error
+        self.failures = failures
+        self.reply = reply
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, stream=False, **options):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return FakeStreamedResponse(self.reply)
+
+
+@pytest.fixture
+def retrying_communicator(communicator, clock, monkeypatch):
+    """A communicator whose retries advance the fake clock instead of sleeping, with a fixed 10s backoff."""
+    async def fake_sleep(seconds):
+        clock.now += seconds
+
+    monkeypatch.setattr(gemini_comms_real.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(communicator, "_next_step_call_options", lambda: {})
+    monkeypatch.setattr(communicator, "_retry_backoff_seconds", lambda attempt: 10.0)
+    return communicator
+
+
+def _next_step(communicator):
+    return asyncio.run(communicator.get_next_step_from_gemini_async(
+        "Build a CLI", _turns("start"), None, max_history_turns=10, max_context_tokens=30000, cursor_log_content=None
+    ))
+
+
+def test_next_step_retries_transient_error_then_succeeds(retrying_communicator, clock):
+    api_exceptions = pytest.importorskip("google.api_core.exceptions")
+    retrying_communicator.model = FlakyModel(api_exceptions.ServiceUnavailable("busy"), failures=2)
+    started_at = clock.now
+
+    result = _next_step(retrying_communicator)
+
+    assert result["next_step_action"] == "WRITE_TO_FILE"
+    assert result["instruction"] == "Run the tests"
+    assert retrying_communicator.model.calls == 3
+    assert clock.now - started_at == pytest.approx(20.0)
+
+
+def test_next_step_stops_retrying_at_budget(retrying_communicator, clock):
+    api_exceptions = pytest.importorskip("google.api_core.exceptions")
+    retrying_communicator.model = FlakyModel(api_exceptions.ServiceUnavailable("busy"), failures=100)
+    started_at = clock.now
+
+    result = _next_step(retrying_communicator)
+
+    assert result["next_step_action"] == "SYSTEM_ERROR"
+    assert retrying_communicator.model.calls == 5 # A sixth attempt would start after 40s + 10s > the 45s budget
+    assert clock.now - started_at <= GeminiCommunicator.RETRY_BUDGET_SECONDS
+
+
+def test_next_step_does_not_retry_non_transient_error(retrying_communicator):
+    api_exceptions = pytest.importorskip("google.api_core.exceptions")
+    retrying_communicator.model = FlakyModel(api_exceptions.InvalidArgument("bad request"), failures=100)
+
+    assert _next_step(retrying_communicator)["next_step_action"] == "SYSTEM_ERROR"
+    assert retrying_communicator.model.calls == 1
+
+
+def test_summary_cache_opens_database_on_first_use(tmp_path):
+    db_path = tmp_path / "cache" / "summaries.db"
+    cache = SummaryDiskCache(str(db_path))
+    assert not db_path.exists()
+
+    assert cache.get("key") is None
+    cache.set("key", "the summary")
+
+    assert db_path.exists()
+    assert SummaryDiskCache(str(db_path)).get("key") == "the summary" # Survives a restart
+
+
+def test_summary_cache_disabled_by_empty_path():
+    cache = SummaryDiskCache("")
+    cache.set("key", "the summary")
+
+    assert not cache.enabled
+    assert cache.get("key") is None
+
+
+def test_summary_cache_disables_itself_when_database_cannot_open(tmp_path):
+    blocking_file = tmp_path / "not_a_dir"
+    blocking_file.write_text("")
+    cache = SummaryDiskCache(os.path.join(str(blocking_file), "summaries.db"))
+
+    assert cache.get("key") is None
+    assert not cache.enabled
+    cache.set("key", "the summary") # No error once disabled
+
+
+def test_summary_cache_disables_itself_on_sqlite_error(tmp_path):
+    cache = SummaryDiskCache(str(tmp_path / "summaries.db"))
+    cache.set("key", "the summary")
+    with sqlite3.connect(cache.db_path) as connection:
+        connection.execute("DROP TABLE summaries")
+
+    assert cache.get("key") is None
+    assert not cache.enabled
+    assert cache._connection is None
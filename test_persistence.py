@@ -0,0 +1,111 @@
+import json
+import os
+
+import pytest
+
+import persistence
+from models import Project, ProjectState, Turn
+
+
+@pytest.fixture
+def project(tmp_path):
+    return Project(name="HistoryProj", workspace_root_path=str(tmp_path), overall_goal="Test history persistence", id="proj-1")
+
+
+def _state_dir(project: Project) -> str:
+    return os.path.join(project.workspace_root_path, persistence.PROJECT_STATE_DIR_NAME)
+
+
+def _history_path(project: Project) -> str:
+    return os.path.join(_state_dir(project), persistence.PROJECT_HISTORY_FILE_NAME)
+
+
+def _write_legacy_state(project: Project, messages):
+    os.makedirs(_state_dir(project), exist_ok=True)
+    state_data = {
+        "project_id": project.id,
+        "conversation_history": [{"sender": "user", "message": message, "timestamp": "t"} for message in messages],
+    }
+    with open(os.path.join(_state_dir(project), persistence.PROJECT_STATE_FILE_NAME), "w") as f:
+        json.dump(state_data, f)
+
+
+def _read_state_file(project: Project) -> dict:
+    with open(os.path.join(_state_dir(project), persistence.PROJECT_STATE_FILE_NAME)) as f:
+        return json.load(f)
+
+
+def test_append_turn_appends_one_line_per_turn(project):
+    persistence.save_conversation_history(project, [Turn("user", "first", "t1")])
+    persistence.append_turn(project, Turn("GEMINI", "second", "t2"))
+
+    with open(_history_path(project), "rb") as f:
+        assert len(f.read().splitlines()) == 2
+
+    persistence.save_project_state(project, ProjectState(project_id=project.id))
+    loaded = persistence.load_project_state(project)
+    assert [turn.message for turn in loaded.conversation_history] == ["first", "second"]
+
+
+def test_append_turn_writes_full_history_when_file_missing(project):
+    history = [Turn("user", "earlier", "t1"), Turn("GEMINI", "latest", "t2")]
+    persistence.append_turn(project, history[-1], full_history=history)
+
+    persistence.save_project_state(project, ProjectState(project_id=project.id))
+    loaded = persistence.load_project_state(project)
+    assert [turn.message for turn in loaded.conversation_history] == ["earlier", "latest"]
+
+
+def test_save_project_state_omits_history_once_jsonl_exists(project):
+    state = ProjectState(project_id=project.id, conversation_history=[Turn("user", "hello", "t")])
+    persistence.save_conversation_history(project, state.conversation_history)
+    persistence.save_project_state(project, state)
+
+    assert "conversation_history" not in _read_state_file(project)
+
+
+def test_legacy_history_is_migrated_to_jsonl(project):
+    _write_legacy_state(project, ["old one", "old two"])
+
+    loaded = persistence.load_project_state(project)
+
+    assert [turn.message for turn in loaded.conversation_history] == ["old one", "old two"]
+    assert os.path.exists(_history_path(project))
+    persistence.save_project_state(project, loaded)
+    assert "conversation_history" not in _read_state_file(project)
+    assert [turn.message for turn in persistence.load_project_state(project).conversation_history] == ["old one", "old two"]
+
+
+def test_failed_migration_keeps_embedded_history(project, monkeypatch):
+    _write_legacy_state(project, ["keep me"])
+    real_save_history = persistence.save_conversation_history
+
+    def failing_save_history(*args, **kwargs):
+        raise persistence.PersistenceError("disk full")
+
+    monkeypatch.setattr(persistence, "save_conversation_history", failing_save_history)
+    loaded = persistence.load_project_state(project)
+    persistence.save_project_state(project, loaded)
+
+    assert not os.path.exists(_history_path(project))
+    assert [turn["message"] for turn in _read_state_file(project)["conversation_history"]] == ["keep me"]
+
+    # The next append after the disk recovers writes the complete history, not just the new turn
+    monkeypatch.setattr(persistence, "save_conversation_history", real_save_history)
+    new_turn = Turn("user", "new", "t")
+    loaded.conversation_history.append(new_turn)
+    persistence.append_turn(project, new_turn, full_history=loaded.conversation_history)
+    persistence.save_project_state(project, loaded)
+
+    assert "conversation_history" not in _read_state_file(project)
+    assert [turn.message for turn in persistence.load_project_state(project).conversation_history] == ["keep me", "new"]
+
+
+def test_invalid_history_lines_are_skipped(project):
+    persistence.save_conversation_history(project, [Turn("user", "good", "t")])
+    with open(_history_path(project), "ab") as f:
+        f.write(b"{not json\n")
+    persistence.save_project_state(project, ProjectState(project_id=project.id))
+
+    loaded = persistence.load_project_state(project)
+    assert [turn.message for turn in loaded.conversation_history] == ["good"]